@@ -17,9 +17,18 @@
 
 from . rv_ui import *
 from . rv_ops import *
+from . import api
+from . rv_cache import (
+    register_cache_handlers, unregister_cache_handlers, get_group_table, group_index,
+    tag_overlay_groups_update, tag_overlay_group_color_update, tag_overlay_group_visibility_update,
+    tag_overlay_mesh_source_update, tag_overlay_wireframe_update, tag_overlay_poles_update,
+    tag_overlay_outline_update, tag_overlay_fill_update, tag_gpu_memory_budget_update, get_gpu_pool_stats,
+    DEFAULT_GPU_MEMORY_BUDGET_MB
+)
+from . rv_overlay import register_draw_manager, unregister_draw_manager, tag_overlay_enabled_update, tag_profiling_hud_update
 
-from bpy.types import PropertyGroup
-from bpy.props import IntProperty, BoolProperty, StringProperty, CollectionProperty, FloatVectorProperty, FloatProperty
+from bpy.types import PropertyGroup, AddonPreferences
+from bpy.props import IntProperty, BoolProperty, StringProperty, CollectionProperty, FloatVectorProperty, FloatProperty, EnumProperty
 import bpy
 
 
@@ -38,15 +47,9 @@ bl_info = {
 
 class RETOPOVIEW_group(PropertyGroup):
     def ensure_unique_name(self, value):
-        obj = bpy.context.active_object
         new_name = self.name
-        group_names = set()
-
-        for group in obj.rv_groups:
-            if group.group_id != self.group_id:
-                group_names.add(group.name)
 
-        if new_name not in group_names:
+        if not get_group_table(self.id_data).rename(group_index(self), new_name):
             return
 
         try:
@@ -59,20 +62,53 @@ class RETOPOVIEW_group(PropertyGroup):
             self.name = self.name + "_1"
 
     name: StringProperty(default='Group', update=ensure_unique_name)
-    color: FloatVectorProperty(name="group color", subtype='COLOR', default=[1.0, 1.0, 1.0], min=0.0, max=1.0)
-    group_id: IntProperty(default=1)
+    color: FloatVectorProperty(name="group color", subtype='COLOR', default=[1.0, 1.0, 1.0], min=0.0, max=1.0, update=tag_overlay_group_color_update)
+    group_id: IntProperty(default=1, update=tag_overlay_groups_update)
+    visible: BoolProperty(default=True, update=tag_overlay_group_visibility_update)
+
+
+class RETOPOVIEW_preferences(AddonPreferences):
+    bl_idname = __name__
+
+    gpu_memory_budget: IntProperty(
+        name="GPU Memory Budget",
+        description="Overlay batches above this size are freed for objects that are not on screen, 0 disables the limit",
+        default=DEFAULT_GPU_MEMORY_BUDGET_MB, min=0, soft_max=8192,
+        update=tag_gpu_memory_budget_update
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "gpu_memory_budget", text="GPU Memory Budget (MB)")
+
+        pool_stats = get_gpu_pool_stats()
+
+        stats_column = layout.box().column(align=True)
+        stats_column.label(text="Cached objects: {}".format(pool_stats["objects"]))
+        stats_column.label(text="Batch memory: {:.1f} MB".format(pool_stats["bytes"] / (1024 * 1024)))
+        stats_column.label(text="Evictions: {}".format(pool_stats["evictions"]))
+        stats_column.label(text="Shaders compiled: {}".format(pool_stats["shaders"]))
 
 
 classes = (
-    RETOPOVIEW_OT_overlay,
     RETOPOVIEW_PT_rv_tool_menu,
+    RETOPOVIEW_PT_group_stats,
     RETOPOVIEW_OT_toggle_mode,
     RETOPOVIEW_group,
+    RETOPOVIEW_preferences,
     RETOPOVIEW_UL_group_list,
     RETOPOVIEW_OT_add_group,
     RETOPOVIEW_OT_remove_group,
     RETOPOVIEW_OT_move_group,
     RETOPOVIEW_OT_change_selection_group_id,
+    RETOPOVIEW_OT_flood_fill_group,
+    RETOPOVIEW_OT_grow_group,
+    RETOPOVIEW_OT_group_islands,
+    RETOPOVIEW_OT_export_groups,
+    RETOPOVIEW_OT_import_groups,
+    RETOPOVIEW_OT_transfer_groups,
+    RETOPOVIEW_OT_dump_timings,
+    RETOPOVIEW_OT_clear_timings,
     RETOPOVIEW_OT_handle_face_selection,
     RETOPOVIEW_OT_find_parent_group,
     RETOPOVIEW_MT_rv_pie_menu
@@ -85,28 +121,56 @@ def register():
     for c in classes:
         bpy.utils.register_class(c)
 
-    bpy.types.Object.rv_enabled = BoolProperty()
+    bpy.types.Object.rv_enabled = BoolProperty(update=tag_overlay_enabled_update)
     bpy.types.Object.rv_backface_culling = BoolProperty()
     bpy.types.Object.rv_use_x_mirror = BoolProperty()
-    bpy.types.Object.rv_show_wire = BoolProperty()
-    bpy.types.Object.rv_show_poles = BoolProperty()
+    bpy.types.Object.rv_x_mirror_tolerance = FloatProperty(default=0.001, min=0.0, max=1.0, precision=4)
+    bpy.types.Object.rv_show_fill = BoolProperty(default=True, update=tag_overlay_fill_update)
+    bpy.types.Object.rv_show_wire = BoolProperty(update=tag_overlay_wireframe_update)
+    bpy.types.Object.rv_show_group_outline = BoolProperty(update=tag_overlay_outline_update)
+    bpy.types.Object.rv_show_poles = BoolProperty(update=tag_overlay_poles_update)
+
+    bpy.types.Object.rv_mesh_source = EnumProperty(
+        items=(
+            ('EVALUATED', "Evaluated", "Draw the overlay on the mesh with modifiers applied"),
+            ('BASE', "Base", "Draw the overlay on the base mesh without modifiers, cheaper on heavy modifier stacks")
+        ),
+        default='EVALUATED',
+        update=tag_overlay_mesh_source_update
+    )
 
     bpy.types.Object.rv_index = IntProperty()
     bpy.types.Object.rv_group_idx_counter = IntProperty(default=1)
 
     bpy.types.Object.rv_groups = CollectionProperty(type=RETOPOVIEW_group)
 
-    bpy.types.Object.rv_groups_alpha = FloatProperty(default=1.0, max=1.0, min=0.0)
-    bpy.types.Object.rv_poles_size = FloatProperty(default=1.0, max=2.0, min=0.0)
+    bpy.types.Object.rv_wire_offset = FloatProperty(default=0.002, max=0.05, min=0.0, precision=4, update=tag_overlay_wireframe_update)
+    bpy.types.Object.rv_groups_alpha = FloatProperty(default=1.0, max=1.0, min=0.0, update=tag_overlay_wireframe_update)
+    bpy.types.Object.rv_poles_size = FloatProperty(default=1.0, max=2.0, min=0.0, update=tag_overlay_poles_update)
 
-    bpy.types.Object.rv_poles_color = FloatVectorProperty(name="Poles Color", subtype='COLOR', default=[1.0, 1.0, 1.0], min=0.0, max=1.0)
+    bpy.types.Object.rv_outline_color = FloatVectorProperty(name="Group Outline Color", subtype='COLOR', default=[1.0, 0.6, 0.1], min=0.0, max=1.0, update=tag_overlay_outline_update)
 
-    wm = bpy.context.window_manager
-    km = wm.keyconfigs.addon.keymaps.new(name='3D View', space_type='VIEW_3D')
-    kmi = km.keymap_items.new('wm.call_menu_pie', 'F', 'PRESS', ctrl=False, shift=True, alt=False)
-    kmi.properties.name = "RETOPOVIEW_MT_rv_pie_menu"
+    bpy.types.Object.rv_show_n_poles = BoolProperty(default=False, update=tag_overlay_poles_update)
+    bpy.types.Object.rv_show_e_poles = BoolProperty(default=True, update=tag_overlay_poles_update)
+    bpy.types.Object.rv_show_high_valence_poles = BoolProperty(default=True, update=tag_overlay_poles_update)
 
-    addon_keymaps.append((km, kmi))
+    bpy.types.Object.rv_n_poles_color = FloatVectorProperty(name="N-Poles Color", subtype='COLOR', default=[0.2, 0.6, 1.0], min=0.0, max=1.0, update=tag_overlay_poles_update)
+    bpy.types.Object.rv_poles_color = FloatVectorProperty(name="E-Poles Color", subtype='COLOR', default=[1.0, 1.0, 1.0], min=0.0, max=1.0, update=tag_overlay_poles_update)
+    bpy.types.Object.rv_high_valence_poles_color = FloatVectorProperty(name="High Valence Poles Color", subtype='COLOR', default=[1.0, 0.3, 0.2], min=0.0, max=1.0, update=tag_overlay_poles_update)
+
+    bpy.types.WindowManager.rv_show_profiling_hud = BoolProperty(name="Profiling HUD", update=tag_profiling_hud_update)
+
+    register_cache_handlers()
+    register_draw_manager()
+
+    # there is no add-on keyconfig when running in background mode
+    kc = bpy.context.window_manager.keyconfigs.addon
+    if kc is not None:
+        km = kc.keymaps.new(name='3D View', space_type='VIEW_3D')
+        kmi = km.keymap_items.new('wm.call_menu_pie', 'F', 'PRESS', ctrl=False, shift=True, alt=False)
+        kmi.properties.name = "RETOPOVIEW_MT_rv_pie_menu"
+
+        addon_keymaps.append((km, kmi))
 
 
 def unregister():
@@ -114,18 +178,36 @@ def unregister():
         km.keymap_items.remove(kmi)
     addon_keymaps.clear()
 
+    unregister_draw_manager()
+    unregister_cache_handlers()
+
+    del bpy.types.WindowManager.rv_show_profiling_hud
+
+    del bpy.types.Object.rv_high_valence_poles_color
     del bpy.types.Object.rv_poles_color
+    del bpy.types.Object.rv_n_poles_color
+
+    del bpy.types.Object.rv_show_high_valence_poles
+    del bpy.types.Object.rv_show_e_poles
+    del bpy.types.Object.rv_show_n_poles
+
+    del bpy.types.Object.rv_outline_color
 
     del bpy.types.Object.rv_poles_size
     del bpy.types.Object.rv_groups_alpha
+    del bpy.types.Object.rv_wire_offset
 
     del bpy.types.Object.rv_groups
 
     del bpy.types.Object.rv_group_idx_counter
     del bpy.types.Object.rv_index
+    del bpy.types.Object.rv_mesh_source
 
     del bpy.types.Object.rv_show_poles
+    del bpy.types.Object.rv_show_group_outline
     del bpy.types.Object.rv_show_wire
+    del bpy.types.Object.rv_show_fill
+    del bpy.types.Object.rv_x_mirror_tolerance
     del bpy.types.Object.rv_use_x_mirror
     del bpy.types.Object.rv_backface_culling
     del bpy.types.Object.rv_enabled
@@ -0,0 +1,101 @@
+# RetopoView
+# Copyright (C) 2021  Loki Bear
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Scripting entry points - work in object and edit mode, need no selection, context or bpy.ops.
+# Face group ids move as whole arrays through foreach_get/foreach_set on the group layer.
+
+import numpy as np
+
+from . rv_cache import get_group_table, sync_edit_mesh
+from . rv_buffers import read_face_group_ids
+from . rv_ops import ensure_group_layer, apply_face_groups, create_group, get_random_group_color
+
+
+__all__ = ('get_face_groups', 'set_face_groups', 'assign', 'create_groups', 'group_face_counts')
+
+
+def check_mesh_object(obj):
+    if obj is None or obj.type != 'MESH':
+        raise TypeError("RetopoView groups need a mesh object")
+
+
+def get_face_groups(obj):
+    check_mesh_object(obj)
+    sync_edit_mesh(obj)
+
+    return read_face_group_ids(obj.data)
+
+
+def set_face_groups(obj, face_groups):
+    check_mesh_object(obj)
+    sync_edit_mesh(obj)
+
+    current_groups = read_face_group_ids(obj.data)
+    face_groups = np.asarray(face_groups, dtype=np.int32)
+
+    if face_groups.shape != current_groups.shape:
+        raise ValueError("Expected {} face group ids, got {}".format(len(current_groups), face_groups.shape))
+
+    ensure_group_layer(obj)
+
+    # only faces whose id actually changes are touched, which keeps the overlay update local
+    changed_faces = np.flatnonzero(current_groups != face_groups)
+    apply_face_groups(obj, current_groups, changed_faces, face_groups[changed_faces])
+
+
+def assign(obj, face_indices, group_id):
+    check_mesh_object(obj)
+
+    if group_id != 0 and group_id not in get_group_table(obj).id_to_index:
+        raise ValueError("Object {} has no group with id {}".format(obj.name, group_id))
+
+    sync_edit_mesh(obj)
+
+    face_groups = read_face_group_ids(obj.data)
+    face_indices = np.unique(np.asarray(face_indices, dtype=np.int64))
+
+    if len(face_indices) and (face_indices[0] < 0 or face_indices[-1] >= len(face_groups)):
+        raise IndexError("Face index out of range for {} faces".format(len(face_groups)))
+
+    ensure_group_layer(obj)
+    apply_face_groups(obj, face_groups, face_indices, group_id)
+
+
+def create_groups(obj, names, colors=None):
+    check_mesh_object(obj)
+
+    if colors is None:
+        colors = [get_random_group_color() for _ in names]
+
+    if len(colors) != len(names):
+        raise ValueError("Expected {} colors, got {}".format(len(names), len(colors)))
+
+    group_ids = [create_group(obj, name, color).group_id for name, color in zip(names, colors)]
+
+    ensure_group_layer(obj)
+    obj.data.update()
+
+    return group_ids
+
+
+def group_face_counts(obj):
+    face_groups = get_face_groups(obj)
+    group_ids = get_group_table(obj).group_ids
+
+    face_counts = np.bincount(face_groups[face_groups >= 0], minlength=max(group_ids, default=0) + 1)
+
+    return {group_id: int(face_counts[group_id]) if group_id >= 0 else 0 for group_id in group_ids}
@@ -0,0 +1,401 @@
+# RetopoView
+# Copyright (C) 2021  Loki Bear
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Headless benchmarks for the overlay build and the group operators, no GPU needed:
+#
+#   blender --background --factory-startup --python benchmarks/benchmark.py -- --output results.json
+#   blender --background --factory-startup --python benchmarks/benchmark.py -- --baseline results.json
+#
+# With --baseline every stage slower than the baseline by more than the tolerance is reported
+# and blender exits with code 1.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import bpy
+import numpy as np
+
+# blender --python leaves the script folder off sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+from addon_loader import import_addon
+
+
+DEFAULT_SIZES = (10000, 100000, 500000, 2000000)
+DEFAULT_SHAPES = ('GRID', 'SPHERE')
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    parser = argparse.ArgumentParser(prog="benchmark.py", description="RetopoView headless benchmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma separated face counts")
+    parser.add_argument("--shapes", default=",".join(DEFAULT_SHAPES), help="comma separated GRID, SPHERE")
+    parser.add_argument("--groups", type=int, default=16, help="number of rv_groups per mesh")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage, the median is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--timings", help="dump the add-on timing registry to this CSV or JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="slowdowns below this are noise")
+    parser.add_argument("--memory-builds", type=int, default=300, help="overlay builds sampled for the RSS check")
+    parser.add_argument("--memory-warmup", type=int, default=20, help="builds run before RSS sampling starts")
+    parser.add_argument("--memory-max-faces", type=int, default=100000, help="larger meshes skip the RSS check")
+    parser.add_argument("--max-rss-slope-kb", type=float, default=16.0, help="allowed RSS growth per build")
+
+    return parser.parse_args(argv)
+
+
+def grid_topology(face_count):
+    side = max(1, int(round(face_count ** 0.5)))
+    row_verts = side + 1
+
+    u, v = np.meshgrid(np.linspace(-1, 1, row_verts), np.linspace(-1, 1, row_verts))
+    coords = np.column_stack((u.ravel(), v.ravel(), np.zeros(row_verts * row_verts)))
+
+    corners = (np.arange(side)[:, np.newaxis] * row_verts + np.arange(side)).ravel()
+    loop_verts = np.column_stack((corners, corners + 1, corners + row_verts + 1, corners + row_verts))
+
+    return coords, loop_verts.ravel(), np.full(len(corners), 4)
+
+
+def sphere_topology(face_count):
+    # uv sphere with triangle fans at the poles, twice as many segments as rings
+    rings = max(3, int(round((face_count / 2) ** 0.5)))
+    segments = rings * 2
+
+    theta = np.linspace(0, np.pi, rings + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    theta, phi = np.meshgrid(theta, phi, indexing='ij')
+
+    ring_coords = np.column_stack((
+        (np.sin(theta) * np.cos(phi)).ravel(), (np.sin(theta) * np.sin(phi)).ravel(), np.cos(theta).ravel()
+    ))
+    coords = np.concatenate(((0, 0, 1), ring_coords, (0, 0, -1)), axis=None).reshape(-1, 3)
+    bottom_vert = len(coords) - 1
+
+    segment = np.arange(segments)
+    next_segment = (segment + 1) % segments
+
+    top_fan = np.column_stack((np.zeros(segments, dtype=np.int64), 1 + next_segment, 1 + segment))
+
+    ring_starts = 1 + np.arange(rings - 2)[:, np.newaxis] * segments
+    quads = np.stack((
+        ring_starts + segment, ring_starts + next_segment,
+        ring_starts + segments + next_segment, ring_starts + segments + segment
+    ), axis=-1).reshape(-1, 4)
+
+    last_ring = 1 + (rings - 2) * segments
+    bottom_fan = np.column_stack((np.full(segments, bottom_vert), last_ring + segment, last_ring + next_segment))
+
+    loop_verts = np.concatenate((top_fan.ravel(), quads.ravel(), bottom_fan.ravel()))
+    loop_totals = np.concatenate((np.full(segments, 3), np.full(len(quads), 4), np.full(segments, 3)))
+
+    return coords, loop_verts, loop_totals
+
+
+def create_mesh_object(name, coords, loop_verts, loop_totals):
+    mesh = bpy.data.meshes.new(name)
+
+    mesh.vertices.add(len(coords))
+    mesh.vertices.foreach_set("co", coords.astype(np.float32).ravel())
+
+    mesh.loops.add(len(loop_verts))
+    mesh.loops.foreach_set("vertex_index", loop_verts.astype(np.int32))
+
+    mesh.polygons.add(len(loop_totals))
+    mesh.polygons.foreach_set("loop_start", (np.cumsum(loop_totals) - loop_totals).astype(np.int32))
+    mesh.polygons.foreach_set("loop_total", loop_totals.astype(np.int32))
+
+    mesh.update(calc_edges=True)
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    bpy.context.view_layer.objects.active = obj
+    obj.select_set(True)
+
+    return obj
+
+
+def remove_mesh_object(obj):
+    mesh = obj.data
+
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(mesh)
+
+
+def time_stage(run, repeat, setup=None):
+    # one untimed warm-up run, then the median and the fastest of the timed ones
+    timings = []
+
+    for run_idx in range(repeat + 1):
+        run_args = (setup(),) if setup is not None else ()
+
+        start = time.perf_counter()
+        run(*run_args)
+        elapsed = time.perf_counter() - start
+
+        if run_idx > 0:
+            timings.append(elapsed)
+
+    return {"median": statistics.median(timings), "min": min(timings)}
+
+
+def current_rss_mb():
+    # resident set size from procfs, platforms without it skip the memory check
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class MeshBenchmark:
+    def __init__(self, modules, obj, args):
+        self.modules = modules
+        self.obj = obj
+        self.args = args
+        self.rng = np.random.default_rng(args.seed)
+
+        api = modules['api']
+        self.group_ids = api.create_groups(obj, ["Group {}".format(group_idx) for group_idx in range(args.groups)])
+
+        face_count = len(obj.data.polygons)
+        api.set_face_groups(obj, self.rng.choice(np.append(0, self.group_ids), face_count))
+        obj.rv_enabled = True
+
+    def take_snapshot(self, previous_triangles=None):
+        rv_overlay = self.modules['rv_overlay']
+
+        snapshot = rv_overlay.OverlaySnapshot(
+            self.obj, set(self.modules['rv_cache'].OVERLAY_PARTS), 0, previous_triangles
+        )
+        with rv_overlay.overlay_source_mesh(self.obj, bpy.context.evaluated_depsgraph_get()) as (source_obj, mesh):
+            snapshot.read_mesh(source_obj, mesh)
+
+        return snapshot
+
+    def build_triangles(self, snapshot):
+        rv_overlay = self.modules['rv_overlay']
+
+        return self.modules['rv_buffers'].build_chunked_triangle_buffers(
+            snapshot.coords, snapshot.tri_verts, snapshot.tri_faces, snapshot.face_groups, snapshot.color_lut,
+            snapshot.face_hidden, rv_overlay.CHUNK_TARGET_FACES, snapshot.previous_triangles
+        )
+
+    def reassigned_snapshot(self, triangle_data):
+        # a brush-sized reassignment on top of an unchanged layout, the in-place rebuild path
+        snapshot = self.take_snapshot(triangle_data)
+        changed_faces = self.rng.choice(snapshot.face_count, max(1, snapshot.face_count // 100), replace=False)
+        snapshot.face_groups = snapshot.face_groups.copy()
+        snapshot.face_groups[changed_faces] = self.rng.choice(self.group_ids)
+
+        return snapshot
+
+    def overlay_stages(self):
+        rv_overlay = self.modules['rv_overlay']
+        repeat = self.args.repeat
+
+        snapshot = self.take_snapshot()
+        triangle_data = self.build_triangles(snapshot)
+
+        return {
+            "snapshot": time_stage(self.take_snapshot, repeat),
+            "triangles": time_stage(lambda: self.build_triangles(snapshot), repeat),
+            "triangles_reused": time_stage(
+                self.build_triangles, repeat, setup=lambda: self.reassigned_snapshot(triangle_data)
+            ),
+            "wireframe": time_stage(lambda: rv_overlay.prep_wireframe_buffers(snapshot), repeat),
+            "outline": time_stage(lambda: rv_overlay.prep_outline_buffers(snapshot), repeat),
+            "poles": time_stage(lambda: rv_overlay.prep_pole_buffers(snapshot), repeat),
+        }
+
+    def select_random_faces(self):
+        mesh = self.obj.data
+        face_count = len(mesh.polygons)
+
+        set_faces_selected = self.modules['rv_buffers'].set_faces_selected
+        set_faces_selected(mesh, np.arange(face_count), False)
+        set_faces_selected(mesh, self.rng.choice(face_count, max(1, face_count // 10), replace=False), True)
+
+    def add_removable_group(self):
+        api = self.modules['api']
+        obj = self.obj
+
+        group_id, = api.create_groups(obj, ["Removed Group"])
+        api.assign(obj, self.rng.choice(len(obj.data.polygons), max(1, len(obj.data.polygons) // 10), replace=False), group_id)
+        obj.rv_index = len(obj.rv_groups) - 1
+
+    def operator_stages(self):
+        repeat = self.args.repeat
+        self.select_random_faces()
+
+        stages = {
+            "op_assign": time_stage(bpy.ops.retopoview.change_selection_group_id, repeat),
+            "op_select": time_stage(bpy.ops.retopoview.handle_face_selection, repeat),
+            "op_find": time_stage(bpy.ops.retopoview.find_parent_group, repeat),
+            "op_remove": time_stage(lambda _: bpy.ops.retopoview.remove_group(), repeat, setup=self.add_removable_group),
+        }
+
+        return stages
+
+    def rss_growth(self):
+        # builds from temporary meshes must not pile up, after the warm-up RSS has to stay flat
+        def build():
+            self.modules['rv_overlay'].prepare_overlay_buffers(self.take_snapshot())
+
+        for _ in range(self.args.memory_warmup):
+            build()
+
+        gc.collect()
+        rss_samples = []
+
+        for _ in range(self.args.memory_builds):
+            build()
+            rss_samples.append(current_rss_mb())
+
+        if len(rss_samples) < 2 or None in rss_samples:
+            return None
+
+        # the slope of a fitted line ignores allocator noise that a first/last difference picks up
+        slope_mb = np.polyfit(np.arange(len(rss_samples)), rss_samples, 1)[0]
+
+        return {"slope_kb": slope_mb * 1024, "growth_mb": rss_samples[-1] - rss_samples[0]}
+
+
+def run_benchmarks(modules, args):
+    results = {}
+    memory = {}
+
+    for shape in args.shapes.upper().split(","):
+        topology = grid_topology if shape == 'GRID' else sphere_topology
+
+        for size in map(int, args.sizes.split(",")):
+            build_start = time.perf_counter()
+            obj = create_mesh_object("{}_{}".format(shape.lower(), size), *topology(size))
+            benchmark = MeshBenchmark(modules, obj, args)
+            print("{} {}: {} faces, set up in {:.2f}s".format(
+                shape, size, len(obj.data.polygons), time.perf_counter() - build_start
+            ))
+
+            stages = benchmark.overlay_stages()
+            stages.update(benchmark.operator_stages())
+
+            for stage, timing in stages.items():
+                results["{}/{}/{}".format(shape, size, stage)] = timing
+                print("    {:<18} {:>10.2f} ms".format(stage, timing["median"] * 1000))
+
+            if len(obj.data.polygons) <= args.memory_max_faces:
+                rss_growth = benchmark.rss_growth()
+                memory["{}/{}".format(shape, size)] = rss_growth
+                if rss_growth is not None:
+                    print("    {:<18} {:>10.2f} KB/build, {:.1f} MB over {} builds".format(
+                        "rss_growth", rss_growth["slope_kb"], rss_growth["growth_mb"], args.memory_builds
+                    ))
+
+            remove_mesh_object(obj)
+            modules['rv_cache'].clear_overlay_cache()
+
+    return {
+        "meta": {
+            "blender": bpy.app.version_string,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "groups": args.groups,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+        "memory": memory,
+    }
+
+
+def compare_to_baseline(report, baseline, args):
+    regressions = []
+    min_delta = args.min_delta_ms / 1000
+
+    for key, timing in sorted(report["results"].items()):
+        base_timing = baseline["results"].get(key)
+        if base_timing is None:
+            continue
+
+        current, base = timing["median"], base_timing["median"]
+        ratio = current / base if base > 0 else float('inf')
+
+        if ratio > 1 + args.tolerance and current - base > min_delta:
+            regressions.append("{}: {:.2f} ms -> {:.2f} ms ({:+.0%})".format(key, base * 1000, current * 1000, ratio - 1))
+
+    missing_keys = sorted(set(baseline["results"]) - set(report["results"]))
+    if missing_keys:
+        print("Not measured in this run: {}".format(", ".join(missing_keys)))
+
+    return regressions
+
+
+def check_memory(report, args):
+    return [
+        "{}: RSS grows by {:.1f} KB per build ({:.1f} MB over {} builds)".format(
+            key, growth["slope_kb"], growth["growth_mb"], args.memory_builds
+        )
+        for key, growth in sorted(report["memory"].items())
+        if growth is not None and growth["slope_kb"] > args.max_rss_slope_kb
+    ]
+
+
+def main():
+    args = parse_args()
+    addon, modules = import_addon(('api', 'rv_cache', 'rv_buffers', 'rv_overlay', 'rv_profiling'))
+    addon.register()
+
+    try:
+        report = run_benchmarks(modules, args)
+    finally:
+        addon.unregister()
+
+    if args.timings:
+        modules['rv_profiling'].dump_timings(args.timings)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+
+    failures = check_memory(report, args)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            failures += compare_to_baseline(report, json.load(baseline_file), args)
+
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print("    " + failure)
+        sys.exit(1)
+
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+import numpy as np
+
+
+GROUP_LAYER_NAME = "RetopoViewGroupLayer"
+
+UNGROUPED_COLOR = (1.0, 1.0, 1.0, 0.0)
+GROUPED_ALPHA = 0.5
+
+
+def read_vertex_coords(mesh):
+    coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coords)
+
+    return coords.reshape(-1, 3)
+
+
+def read_loop_triangles(mesh):
+    triangle_count = len(mesh.loop_triangles)
+
+    tri_verts = np.empty(triangle_count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tri_verts)
+
+    tri_faces = np.empty(triangle_count, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("polygon_index", tri_faces)
+
+    return tri_verts.reshape(-1, 3), tri_faces
+
+
+def read_face_group_ids(mesh):
+    face_groups = np.zeros(len(mesh.polygons), dtype=np.int32)
+
+    retopoViewGroupLayer = mesh.polygon_layers_int.get(GROUP_LAYER_NAME)
+    if retopoViewGroupLayer is not None:
+        retopoViewGroupLayer.data.foreach_get("value", face_groups)
+
+    return face_groups
+
+
+def read_face_hidden(mesh):
+    face_hidden = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("hide", face_hidden)
+
+    return face_hidden
+
+
+def group_lut_rows(color_lut, group_ids):
+    in_range = (group_ids >= 0) & (group_ids < len(color_lut) - 1)
+
+    return np.where(in_range, group_ids, len(color_lut) - 1)
+
+
+def grouped_mask(color_lut, group_ids):
+    return color_lut[group_lut_rows(color_lut, group_ids), 3] > 0
+
+
+def effective_group_ids(color_lut, group_ids):
+    # ids without a group in the LUT are folded onto -1 so they are never uploaded
+    return np.where(grouped_mask(color_lut, group_ids), group_ids, -1)
+
+
+def build_face_triangle_ranges(tri_faces, face_count):
+    # loop triangles are emitted in polygon order, so every face owns one contiguous triangle range
+    face_indices = np.arange(face_count)
+
+    face_tri_start = np.searchsorted(tri_faces, face_indices, side='left')
+    face_tri_end = np.searchsorted(tri_faces, face_indices, side='right')
+
+    return face_tri_start, face_tri_end
+
+
+def expand_ranges(starts, counts):
+    # concatenated arange(start, start + count) of every range, without a Python loop
+    range_offsets = np.repeat(np.cumsum(counts) - counts, counts)
+
+    return np.repeat(starts, counts) + np.arange(counts.sum()) - range_offsets
+
+
+def face_triangle_indices(face_tri_start, face_tri_end, face_indices):
+    starts = face_tri_start[face_indices]
+
+    return expand_ranges(starts, face_tri_end[face_indices] - starts)
+
+
+def read_vertex_normals(mesh):
+    normals = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("normal", normals)
+
+    return normals.reshape(-1, 3)
+
+
+def read_edge_vertices(mesh):
+    edge_verts = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edge_verts)
+
+    return edge_verts.reshape(-1, 2)
+
+
+def read_loop_edges(mesh):
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+
+    return loop_edges
+
+
+def compute_vertex_valence(edge_verts, vertex_count):
+    return np.bincount(edge_verts.ravel(), minlength=vertex_count)
+
+
+def boundary_vertex_mask(edge_verts, loop_edges, vertex_count):
+    edge_face_counts = np.bincount(loop_edges, minlength=len(edge_verts))
+
+    boundary_verts = np.zeros(vertex_count, dtype=bool)
+    boundary_verts[edge_verts[edge_face_counts == 1].ravel()] = True
+
+    return boundary_verts
+
+
+def classify_poles(valence, boundary_verts):
+    # regular border vertices have three edges, so they are never reported as N-poles
+    n_poles = (valence == 3) & ~boundary_verts
+    e_poles = valence == 5
+    high_valence_poles = valence >= 6
+
+    return n_poles, e_poles, high_valence_poles
+
+
+def build_pole_glyphs(coords, normals, pole_verts, pole_colors, glyph_length):
+    pole_count = len(pole_verts)
+
+    positions = np.empty((pole_count * 2, 3), dtype=np.float32)
+    positions[0::2] = coords[pole_verts]
+    positions[1::2] = coords[pole_verts] + normals[pole_verts] * glyph_length
+
+    colors = np.repeat(np.asarray(pole_colors, dtype=np.float32), 2, axis=0)
+    line_indices = np.arange(pole_count * 2, dtype=np.int32).reshape(-1, 2)
+
+    return positions, colors, line_indices
+
+
+def read_face_loop_totals(mesh):
+    face_loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", face_loop_totals)
+
+    return face_loop_totals
+
+
+def read_face_areas(mesh):
+    face_areas = np.empty(len(mesh.polygons), dtype=np.float32)
+    mesh.polygons.foreach_get("area", face_areas)
+
+    return face_areas
+
+
+def build_wireframe_buffers(coords, normals, edge_verts, loop_edges, face_loop_totals, wire_faces, depth_offset):
+    loop_faces = np.repeat(np.arange(len(face_loop_totals)), face_loop_totals)
+
+    # every edge shared by two wire faces is uploaded once
+    wire_edges = np.unique(loop_edges[wire_faces[loop_faces]])
+
+    return build_edge_lines(coords, normals, edge_verts, wire_edges, depth_offset)
+
+
+def build_edge_lines(coords, normals, edge_verts, edges, depth_offset):
+    line_verts, line_indices = np.unique(edge_verts[edges], return_inverse=True)
+
+    positions = coords[line_verts] + normals[line_verts] * depth_offset
+
+    return positions, line_indices.reshape(-1, 2).astype(np.int32)
+
+
+def group_boundary_edges(loop_edges, face_loop_totals, face_groups, edge_count):
+    loop_faces = np.repeat(np.arange(len(face_loop_totals)), face_loop_totals)
+
+    # shift ids so ungrouped (-1) faces count as their own region
+    loop_regions = face_groups[loop_faces].astype(np.float64) + 1.0
+
+    # an edge lies inside one region exactly when the variance of its faces' regions is zero,
+    # which needs nothing but bincounts instead of sorting all loops by edge
+    face_counts = np.bincount(loop_edges, minlength=edge_count)
+    region_sums = np.bincount(loop_edges, weights=loop_regions, minlength=edge_count)
+    region_squares = np.bincount(loop_edges, weights=loop_regions * loop_regions, minlength=edge_count)
+    grouped_faces = np.bincount(loop_edges, weights=loop_regions > 0, minlength=edge_count)
+
+    mixed_regions = face_counts * region_squares != region_sums * region_sums
+    open_edges = face_counts == 1
+
+    return np.flatnonzero((grouped_faces > 0) & (mixed_regions | open_edges))
+
+
+def read_loop_vertices(mesh):
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+
+    return loop_verts
+
+
+def read_select_flags(collection):
+    select = np.empty(len(collection), dtype=bool)
+    collection.foreach_get("select", select)
+
+    return select
+
+
+def write_face_group_ids(mesh, face_groups):
+    retopoViewGroupLayer = mesh.polygon_layers_int.get(GROUP_LAYER_NAME)
+    if retopoViewGroupLayer is None:
+        retopoViewGroupLayer = mesh.polygon_layers_int.new(name=GROUP_LAYER_NAME)
+
+    retopoViewGroupLayer.data.foreach_set("value", np.ascontiguousarray(face_groups, dtype=np.int32))
+
+
+def set_faces_selected(mesh, faces, select):
+    face_select = read_select_flags(mesh.polygons)
+    edge_select = read_select_flags(mesh.edges)
+    vert_select = read_select_flags(mesh.vertices)
+
+    loop_faces = np.repeat(np.arange(len(mesh.polygons)), read_face_loop_totals(mesh))
+    loop_verts = read_loop_vertices(mesh)
+    loop_edges = read_loop_edges(mesh)
+
+    face_select[faces] = select
+
+    # mirror what edit mode does when a face is (de)selected - its edges and verts follow,
+    # except for the ones still used by another selected face
+    changed_loops = np.zeros(len(mesh.polygons), dtype=bool)
+    changed_loops[faces] = True
+    changed_loops = changed_loops[loop_faces]
+
+    vert_select[loop_verts[changed_loops]] = select
+    edge_select[loop_edges[changed_loops]] = select
+
+    if not select:
+        selected_loops = face_select[loop_faces]
+        vert_select[loop_verts[selected_loops]] = True
+        edge_select[loop_edges[selected_loops]] = True
+
+    mesh.vertices.foreach_set("select", vert_select)
+    mesh.edges.foreach_set("select", edge_select)
+    mesh.polygons.foreach_set("select", face_select)
+
+
+class TriangleChunks:
+    def __init__(self):
+        self.source_tri_faces = None
+        self.tri_chunks = None
+
+        self.coords = None
+        self.tri_verts = None
+        self.tri_faces = None
+        self.tri_groups = None
+        self.chunk_bounds = None
+        self.chunk_corners = None
+
+        self.face_tri_start = None
+        self.face_tri_end = None
+        self.face_chunks = None
+
+        self.reused_layout = False
+        self.changed_chunks = None
+
+        # GPU ready arrays of the changed chunks, dropped once they are uploaded
+        self.chunk_buffers = None
+
+    @property
+    def chunk_count(self):
+        return len(self.chunk_bounds) - 1
+
+    def chunk_group_buffers(self, chunk_idx):
+        tri_start = int(self.chunk_bounds[chunk_idx])
+        tri_end = int(self.chunk_bounds[chunk_idx + 1])
+
+        return build_chunk_group_buffers(
+            self.coords, self.tri_verts[tri_start:tri_end], self.tri_groups[tri_start:tri_end]
+        )
+
+
+def build_chunk_group_buffers(coords, tri_verts, tri_groups):
+    grouped = tri_groups >= 0
+    tri_verts = tri_verts[grouped]
+    tri_groups = tri_groups[grouped]
+
+    # one shared vertex buffer per chunk, each group only gets its own index buffer
+    chunk_verts, local_verts = np.unique(tri_verts, return_inverse=True)
+    local_tris = local_verts.reshape(-1, 3).astype(np.int32)
+
+    group_order = np.argsort(tri_groups, kind='stable')
+    group_ids, group_starts = np.unique(tri_groups[group_order], return_index=True)
+    group_tris = np.split(local_tris[group_order], group_starts[1:])
+
+    return coords[chunk_verts], dict(zip(group_ids.tolist(), group_tris))
+
+
+def assign_spatial_chunks(coords, tri_verts, tri_faces, face_count, target_chunk_faces):
+    if len(tri_faces) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # faces are chunked by their center so all triangles of a face always land in the same chunk
+    tri_centroids = coords[tri_verts].mean(axis=1)
+    face_tri_counts = np.maximum(np.bincount(tri_faces, minlength=face_count), 1)
+
+    face_centers = np.stack([
+        np.bincount(tri_faces, weights=tri_centroids[:, axis], minlength=face_count) for axis in range(3)
+    ], axis=1) / face_tri_counts[:, np.newaxis]
+    tri_centers = face_centers[tri_faces]
+
+    bounds_min = tri_centers.min(axis=0)
+    extent = tri_centers.max(axis=0) - bounds_min
+
+    # flat meshes are only gridded along the axes they actually span
+    active_axes = extent > extent.max() * 1e-3
+    if not active_axes.any():
+        return np.zeros(len(tri_faces), dtype=np.int64)
+
+    chunk_target = max(1, int(np.ceil(len(np.unique(tri_faces)) / target_chunk_faces)))
+    cell_size = (np.prod(extent[active_axes]) / chunk_target) ** (1.0 / np.count_nonzero(active_axes))
+
+    grid = np.where(active_axes, np.maximum(np.ceil(extent / cell_size), 1), 1).astype(np.int64)
+    cells = np.minimum(((tri_centers - bounds_min) / cell_size).astype(np.int64), grid - 1)
+    cells[:, ~active_axes] = 0
+
+    cell_ids = (cells[:, 0] * grid[1] + cells[:, 1]) * grid[2] + cells[:, 2]
+    _, tri_chunks = np.unique(cell_ids, return_inverse=True)
+
+    return tri_chunks.ravel()
+
+
+def chunk_bounding_corners(positions, chunk_bounds):
+    vertex_starts = chunk_bounds[:-1] * 3
+
+    if len(vertex_starts) == 0:
+        return np.empty((0, 8, 4), dtype=np.float32)
+
+    bounds_min = np.minimum.reduceat(positions, vertex_starts, axis=0)
+    bounds_max = np.maximum.reduceat(positions, vertex_starts, axis=0)
+
+    corner_picks = np.array(np.meshgrid([0, 1], [0, 1], [0, 1], indexing='ij')).reshape(3, -1).T.astype(bool)
+
+    corners = np.ones((len(vertex_starts), 8, 4), dtype=np.float32)
+    corners[:, :, :3] = np.where(corner_picks[np.newaxis], bounds_max[:, np.newaxis], bounds_min[:, np.newaxis])
+
+    return corners
+
+
+def build_chunked_triangle_buffers(
+    coords, tri_verts, tri_faces, face_groups, color_lut, face_hidden=None, target_chunk_faces=20000, previous=None
+):
+    if face_hidden is not None:
+        visible = ~face_hidden[tri_faces]
+        tri_verts = tri_verts[visible]
+        tri_faces = tri_faces[visible]
+
+    face_count = len(face_groups)
+    chunks = TriangleChunks()
+    chunks.source_tri_faces = tri_faces
+    chunks.coords = coords
+
+    # unchanged topology keeps its chunk layout so only chunks whose content changed get re-uploaded
+    chunks.reused_layout = previous is not None and np.array_equal(previous.source_tri_faces, tri_faces)
+
+    if chunks.reused_layout:
+        chunks.tri_chunks = previous.tri_chunks
+    else:
+        chunks.tri_chunks = assign_spatial_chunks(coords, tri_verts, tri_faces, face_count, target_chunk_faces)
+
+    chunk_count = int(chunks.tri_chunks.max()) + 1 if len(chunks.tri_chunks) else 0
+
+    # ungrouped triangles keep their place in the layout so assigning them later only touches their chunk
+    tri_order = np.argsort(chunks.tri_chunks, kind='stable')
+    ordered_tri_chunks = chunks.tri_chunks[tri_order]
+
+    chunks.tri_verts = tri_verts[tri_order]
+    chunks.tri_faces = tri_faces[tri_order]
+    chunks.tri_groups = effective_group_ids(color_lut, face_groups)[chunks.tri_faces]
+    chunks.chunk_bounds = np.searchsorted(ordered_tri_chunks, np.arange(chunk_count + 1))
+
+    # triangles of a face stay contiguous after the stable sort, so every face keeps a single range
+    ordered_tri_positions = np.empty(len(tri_order), dtype=np.int64)
+    ordered_tri_positions[tri_order] = np.arange(len(tri_order))
+
+    source_tri_start, source_tri_end = build_face_triangle_ranges(tri_faces, face_count)
+    face_tri_counts = source_tri_end - source_tri_start
+    has_triangles = face_tri_counts > 0
+    first_tris = np.minimum(source_tri_start, max(len(tri_order) - 1, 0))
+
+    chunks.face_tri_start = np.where(has_triangles, ordered_tri_positions[first_tris] if len(tri_order) else 0, 0)
+    chunks.face_tri_end = chunks.face_tri_start + face_tri_counts
+    chunks.face_chunks = np.where(has_triangles, chunks.tri_chunks[first_tris] if len(tri_order) else -1, -1)
+
+    chunks.chunk_corners = chunk_bounding_corners(coords[chunks.tri_verts.ravel()], chunks.chunk_bounds)
+
+    if chunks.reused_layout:
+        changed_tris = chunks.tri_groups != previous.tri_groups
+
+        if len(coords) == len(previous.coords):
+            moved_verts = (coords != previous.coords).any(axis=1)
+            changed_tris |= moved_verts[chunks.tri_verts].any(axis=1)
+        else:
+            changed_tris[:] = True
+
+        chunks.changed_chunks = np.unique(ordered_tri_chunks[changed_tris])
+    else:
+        chunks.changed_chunks = np.arange(chunk_count)
+
+    chunks.chunk_buffers = {
+        chunk_idx: chunks.chunk_group_buffers(chunk_idx) for chunk_idx in chunks.changed_chunks.tolist()
+    }
+
+    return chunks
+
+
+def visible_chunk_mask(chunk_corners, clip_matrix):
+    clip = chunk_corners @ np.asarray(clip_matrix, dtype=np.float32).T
+    w = clip[..., 3]
+
+    # a chunk is culled when all of its bounding box corners lie outside the same clip plane
+    outside = np.zeros(len(chunk_corners), dtype=bool)
+    for axis in range(3):
+        outside |= (clip[..., axis] < -w).all(axis=1)
+        outside |= (clip[..., axis] > w).all(axis=1)
+
+    return ~outside
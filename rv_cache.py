@@ -0,0 +1,747 @@
+import bpy
+import gpu
+import time
+import numpy as np
+
+from bpy.app.handlers import persistent
+
+from . rv_shaders import vertex_shader, fragment_shader, group_vertex_shader, group_fragment_shader
+from . rv_buffers import (
+    UNGROUPED_COLOR, GROUPED_ALPHA, read_loop_edges, read_face_loop_totals, effective_group_ids,
+    read_face_group_ids, read_face_areas, read_loop_vertices, read_edge_vertices, compute_vertex_valence,
+    boundary_vertex_mask, face_triangle_indices, visible_chunk_mask
+)
+from . rv_topology import (
+    read_face_centers, build_x_mirror_face_map, build_face_adjacency, compute_group_stats
+)
+
+
+overlay_shader = None
+group_shader = None
+overlay_cache = {}
+mesh_data_cache = {}
+group_tables = {}
+
+# names of objects whose group statistics are recomputed by the next timer run
+group_stats_requests = set()
+
+overlay_stats = {"redraws": 0, "evictions": 0}
+
+
+OVERLAY_PARTS = ('TRIANGLES', 'WIREFRAME', 'OUTLINE', 'POLES')
+
+# group statistics are recomputed once edits pause for this long, the last ones stay on screen until then
+GROUP_STATS_DEBOUNCE_SECONDS = 0.5
+
+DEFAULT_GPU_MEMORY_BUDGET_MB = 512
+# objects drawn this recently are on screen in some viewport and keep their batches
+EVICTION_GRACE_SECONDS = 1.0
+
+
+class OverlayChunk:
+    def __init__(self):
+        self.position_buffer = None
+        self.gpu_bytes = 0
+
+        # group id -> batch sharing the chunk's position buffer, ungrouped faces have none
+        self.group_batches = {}
+
+
+class OverlayCacheEntry:
+    def __init__(self, obj):
+        self.pointer = obj.as_pointer()
+        self.mesh_name = obj.data.name_full
+
+        # batches are double buffered - the last good ones are drawn until a rebuild is swapped in
+        self.wireframe_batch = None
+        self.outline_batch = None
+        self.pole_batch = None
+
+        # approximate GPU memory of the line batches by part, chunks track their own
+        self.line_bytes = {}
+        self.last_drawn = 0.0
+        self.last_built = 0.0
+
+        # evaluated_geometry_signature at the last snapshot, None when the base mesh is drawn
+        self.geometry_signature = None
+
+        self.dirty_parts = set(OVERLAY_PARTS)
+        self.generation = 0
+        self.pending_job = None
+        self.pending_snapshot = None
+
+        self.clear_triangle_data()
+        self.expects_own_update = False
+
+    def clear_triangle_data(self):
+        self.chunks = None
+        self.triangle_data = None
+
+        self.face_groups = None
+        self.color_lut = None
+        self.maps_to_base = False
+
+    def set_triangle_data(self, triangle_data, face_groups, color_lut, maps_to_base):
+        if not triangle_data.reused_layout or self.chunks is None or len(self.chunks) != triangle_data.chunk_count:
+            self.chunks = [OverlayChunk() for _ in range(triangle_data.chunk_count)]
+
+        self.triangle_data = triangle_data
+        self.face_groups = face_groups
+        self.color_lut = color_lut
+        self.maps_to_base = maps_to_base
+
+        for chunk_idx, chunk_buffers in triangle_data.chunk_buffers.items():
+            self.upload_chunk(chunk_idx, chunk_buffers)
+
+        triangle_data.chunk_buffers = None
+
+    def upload_chunk(self, chunk_idx, chunk_buffers=None):
+        if chunk_buffers is None:
+            chunk_buffers = self.triangle_data.chunk_group_buffers(chunk_idx)
+
+        positions, group_tris = chunk_buffers
+        chunk = OverlayChunk()
+
+        if len(positions):
+            chunk.position_buffer = make_vertex_buffer("position", positions)
+
+        chunk.gpu_bytes = gpu_array_bytes(positions, *group_tris.values())
+
+        for group_id, tris in group_tris.items():
+            chunk.group_batches[group_id] = gpu.types.GPUBatch(
+                type='TRIS', buf=chunk.position_buffer, elem=gpu.types.GPUIndexBuf(type='TRIS', seq=tris)
+            )
+
+        self.chunks[chunk_idx] = chunk
+
+    def upload_chunks(self, chunk_indices):
+        for chunk_idx in np.unique(chunk_indices).tolist():
+            if chunk_idx >= 0:
+                self.upload_chunk(chunk_idx)
+
+    @property
+    def gpu_bytes(self):
+        chunk_bytes = sum(chunk.gpu_bytes for chunk in self.chunks) if self.chunks is not None else 0
+
+        return chunk_bytes + sum(self.line_bytes.values())
+
+    def can_update_in_place(self):
+        return (
+            self.chunks is not None
+            and self.triangle_data is not None
+            and self.maps_to_base
+            and 'TRIANGLES' not in self.dirty_parts
+            and self.pending_job is None
+        )
+
+    def visible_chunks(self, clip_matrix):
+        visible = visible_chunk_mask(self.triangle_data.chunk_corners, clip_matrix)
+
+        return [chunk for chunk, chunk_visible in zip(self.chunks, visible.tolist()) if chunk_visible]
+
+    def parts_to_build(self, obj):
+        shown_parts = (
+            ('TRIANGLES', obj.rv_show_fill, self.chunks),
+            ('WIREFRAME', obj.rv_show_wire, self.wireframe_batch),
+            ('OUTLINE', obj.rv_show_group_outline, self.outline_batch),
+            ('POLES', obj.rv_show_poles, self.pole_batch),
+        )
+
+        return {
+            part for part, shown, batch in shown_parts
+            if shown and (part in self.dirty_parts or batch is None)
+        }
+
+    def cancel_pending_job(self):
+        if self.pending_job is None:
+            return
+
+        # a job that already started notices the flag between stages, its result is dropped either way
+        self.pending_job.cancel()
+        self.pending_snapshot.cancelled = True
+
+        self.pending_job = None
+        self.pending_snapshot = None
+
+    def invalidate(self, triangles=True, wireframe=True, poles=True, outline=True):
+        if triangles:
+            self.dirty_parts.add('TRIANGLES')
+        if wireframe:
+            self.dirty_parts.add('WIREFRAME')
+        if outline:
+            self.dirty_parts.add('OUTLINE')
+        if poles:
+            self.dirty_parts.add('POLES')
+
+        self.generation += 1
+        self.cancel_pending_job()
+
+
+class MeshDataCacheEntry:
+    def __init__(self, obj):
+        self.pointer = obj.as_pointer()
+        self.mesh_name = obj.data.name_full
+
+        self.expects_own_update = False
+        self.group_stats = None
+        self.stale_group_stats = None
+        self.invalidate()
+
+    def invalidate(self):
+        self.mirror_faces = None
+        self.mirror_tolerance = None
+        self.face_adjacency = None
+        self.invalidate_group_stats()
+
+    def invalidate_group_stats(self):
+        if self.group_stats is not None:
+            self.stale_group_stats = self.group_stats
+
+        self.group_stats = None
+        self.group_stats_changed = time.monotonic()
+
+
+class GroupTable:
+    def __init__(self, obj):
+        self.pointer = obj.as_pointer()
+
+        # per collection index, mirrors what is stored on the RNA groups
+        self.group_ids = []
+        self.names = []
+        self.colors = []
+        self.visible = []
+
+        self.id_to_index = {}
+        self.name_counts = {}
+        self.hidden_ids = set()
+
+        # dense group id -> color rows, the last row is reserved for ids without a group
+        self.color_lut = np.empty((2, 4), dtype=np.float32)
+        self.color_lut[:] = UNGROUPED_COLOR
+
+        self.append_groups(obj.rv_groups)
+
+    def append_groups(self, groups):
+        for group_idx in range(len(self.group_ids), len(groups)):
+            group = groups[group_idx]
+
+            self.group_ids.append(group.group_id)
+            self.names.append(group.name)
+            self.colors.append(tuple(group.color))
+            self.visible.append(group.visible)
+
+            self.name_counts[group.name] = self.name_counts.get(group.name, 0) + 1
+            self.map_group(group_idx)
+
+    def map_group(self, group_idx):
+        group_id = self.group_ids[group_idx]
+
+        # a new group still carries the default id until its real one is assigned, never let it shadow another group
+        if self.id_to_index.setdefault(group_id, group_idx) != group_idx or group_id < 0:
+            return
+
+        if group_id >= len(self.color_lut) - 1:
+            color_lut = np.empty((max(group_id + 2, len(self.color_lut) * 2), 4), dtype=np.float32)
+            color_lut[:] = UNGROUPED_COLOR
+            color_lut[:len(self.color_lut) - 1] = self.color_lut[:-1]
+            self.color_lut = color_lut
+
+        self.color_lut[group_id] = self.colors[group_idx] + (GROUPED_ALPHA,)
+
+        if self.visible[group_idx]:
+            self.hidden_ids.discard(group_id)
+        else:
+            self.hidden_ids.add(group_id)
+
+    def unmap_group(self, group_idx):
+        group_id = self.group_ids[group_idx]
+
+        if self.id_to_index.get(group_id) != group_idx:
+            return
+
+        del self.id_to_index[group_id]
+        self.hidden_ids.discard(group_id)
+
+        if 0 <= group_id < len(self.color_lut) - 1:
+            self.color_lut[group_id] = UNGROUPED_COLOR
+
+    def set_group_id(self, group_idx, group_id):
+        self.unmap_group(group_idx)
+        self.group_ids[group_idx] = group_id
+        self.map_group(group_idx)
+
+    def set_color(self, group_idx, color):
+        self.colors[group_idx] = tuple(color)
+        self.set_group_id(group_idx, self.group_ids[group_idx])
+
+    def set_visible(self, group_idx, visible):
+        self.visible[group_idx] = visible
+        self.set_group_id(group_idx, self.group_ids[group_idx])
+
+    def rename(self, group_idx, name):
+        old_name = self.names[group_idx]
+
+        if old_name != name:
+            self.name_counts[old_name] -= 1
+            self.name_counts[name] = self.name_counts.get(name, 0) + 1
+            self.names[group_idx] = name
+
+        # True when another group already uses the name
+        return self.name_counts[name] > 1
+
+    def is_drawn(self, group_id):
+        return group_id in self.id_to_index and group_id not in self.hidden_ids
+
+
+def get_group_table(obj):
+    table = group_tables.get(obj.name_full)
+    group_count = len(obj.rv_groups)
+
+    if table is None or table.pointer != obj.as_pointer() or group_count < len(table.group_ids):
+        table = GroupTable(obj)
+        group_tables[obj.name_full] = table
+    elif group_count > len(table.group_ids):
+        # collection items are only ever appended, new rows are read without rebuilding the table
+        table.append_groups(obj.rv_groups)
+
+    return table
+
+
+def invalidate_group_table(obj):
+    # removing or reordering groups does not run any property update, callers drop the table themselves
+    group_tables.pop(obj.name_full, None)
+
+
+def group_index(group):
+    # path of a group item is "rv_groups[<index>]"
+    return int(group.path_from_id().rsplit('[', 1)[1][:-1])
+
+
+def gpu_array_bytes(*arrays):
+    # every vertex attribute and index ends up as 32 bit values on the GPU
+    return sum(array.size for array in arrays) * 4
+
+
+def make_vertex_buffer(attr_id, data):
+    vertex_format = gpu.types.GPUVertFormat()
+    vertex_format.attr_add(id=attr_id, comp_type='F32', len=data.shape[1], fetch_mode='FLOAT')
+
+    vertex_buffer = gpu.types.GPUVertBuf(len=len(data), format=vertex_format)
+    vertex_buffer.attr_fill(id=attr_id, data=data)
+
+    return vertex_buffer
+
+
+def get_overlay_shader():
+    global overlay_shader
+
+    # compiled lazily - shaders can only be created once a GPU context exists
+    if overlay_shader is None:
+        overlay_shader = gpu.types.GPUShader(vertex_shader, fragment_shader)
+
+    return overlay_shader
+
+
+def get_group_shader():
+    global group_shader
+
+    if group_shader is None:
+        group_shader = gpu.types.GPUShader(group_vertex_shader, group_fragment_shader)
+
+    return group_shader
+
+
+def tag_overlay_redraw():
+    window_manager = bpy.context.window_manager
+    if window_manager is None:
+        return
+
+    for window in window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+    overlay_stats["redraws"] += 1
+
+
+def tag_properties_redraw():
+    window_manager = bpy.context.window_manager
+    if window_manager is None:
+        return
+
+    for window in window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'PROPERTIES':
+                area.tag_redraw()
+
+
+def get_cache_entry(cache, entry_type, obj):
+    entry = cache.get(obj.name_full)
+
+    if entry is None or entry.pointer != obj.as_pointer() or entry.mesh_name != obj.data.name_full:
+        entry = entry_type(obj)
+        cache[obj.name_full] = entry
+
+    return entry
+
+
+def get_overlay_cache_entry(obj):
+    return get_cache_entry(overlay_cache, OverlayCacheEntry, obj)
+
+
+def get_mesh_data_cache_entry(obj):
+    return get_cache_entry(mesh_data_cache, MeshDataCacheEntry, obj)
+
+
+def get_x_mirror_faces(obj):
+    # callers in edit mode sync the edit mesh first, the centers are read from the mesh either way
+    entry = get_mesh_data_cache_entry(obj)
+    face_count = len(obj.data.polygons)
+
+    if (
+        entry.mirror_faces is None
+        or len(entry.mirror_faces) != face_count
+        or entry.mirror_tolerance != obj.rv_x_mirror_tolerance
+    ):
+        centers = read_face_centers(obj.data)
+
+        entry.mirror_faces = build_x_mirror_face_map(centers, obj.rv_x_mirror_tolerance)
+        entry.mirror_tolerance = obj.rv_x_mirror_tolerance
+
+    return entry.mirror_faces
+
+
+def get_face_adjacency(obj):
+    # callers in edit mode sync the edit mesh first, the arrays are read from the mesh either way
+    entry = get_mesh_data_cache_entry(obj)
+    mesh = obj.data
+
+    if entry.face_adjacency is None or entry.face_adjacency.face_count != len(mesh.polygons):
+        entry.face_adjacency = build_face_adjacency(
+            read_loop_edges(mesh), read_face_loop_totals(mesh), len(mesh.edges)
+        )
+
+    return entry.face_adjacency
+
+
+def read_group_stats(obj):
+    sync_edit_mesh(obj)
+    mesh = obj.data
+
+    edge_verts = read_edge_vertices(mesh)
+    loop_edges = read_loop_edges(mesh)
+
+    return compute_group_stats(
+        read_face_group_ids(mesh), read_face_loop_totals(mesh), read_face_areas(mesh), read_loop_vertices(mesh),
+        compute_vertex_valence(edge_verts, len(mesh.vertices)),
+        boundary_vertex_mask(edge_verts, loop_edges, len(mesh.vertices))
+    )
+
+
+def get_group_stats(obj):
+    # called from panel draws - stale statistics are only requested here and computed by a timer
+    entry = get_mesh_data_cache_entry(obj)
+
+    if entry.group_stats is None and obj.name_full not in group_stats_requests:
+        group_stats_requests.add(obj.name_full)
+
+        if not bpy.app.timers.is_registered(update_requested_group_stats):
+            bpy.app.timers.register(update_requested_group_stats, first_interval=0.0)
+
+    return entry.group_stats if entry.group_stats is not None else entry.stale_group_stats
+
+
+def update_requested_group_stats():
+    now = time.monotonic()
+    next_interval = None
+
+    for obj_name in tuple(group_stats_requests):
+        obj = bpy.data.objects.get(obj_name)
+
+        if obj is None or obj.type != 'MESH':
+            group_stats_requests.discard(obj_name)
+            continue
+
+        entry = get_mesh_data_cache_entry(obj)
+
+        # every edit pushes the recompute back, only a first computation runs right away
+        wait = entry.group_stats_changed + GROUP_STATS_DEBOUNCE_SECONDS - now
+        if entry.group_stats is None and entry.stale_group_stats is not None and wait > 0:
+            next_interval = wait if next_interval is None else min(next_interval, wait)
+            continue
+
+        if entry.group_stats is None:
+            entry.group_stats = read_group_stats(obj)
+            entry.stale_group_stats = None
+
+        group_stats_requests.discard(obj_name)
+
+    tag_properties_redraw()
+
+    return next_interval
+
+
+def invalidate_group_stats(obj):
+    entry = mesh_data_cache.get(obj.name_full)
+
+    if entry is not None:
+        entry.invalidate_group_stats()
+
+
+def sync_edit_mesh(obj):
+    # flush the edit mesh into obj.data so the array readers see the current topology and flags,
+    # the geometry update this causes carries no change for the caches
+    if obj.mode == 'EDIT':
+        expect_own_mesh_update(obj)
+        obj.update_from_editmode()
+        obj.data.update()
+
+
+def invalidate_overlay_cache(obj, triangles=True, wireframe=True, poles=True, outline=True):
+    entry = overlay_cache.get(obj.name_full)
+
+    if entry is not None:
+        entry.invalidate(triangles, wireframe, poles, outline)
+        tag_overlay_redraw()
+
+
+def reassign_overlay_faces(obj, face_indices, group_ids):
+    # group_ids is either one id for all faces or one id per face
+    entry = overlay_cache.get(obj.name_full)
+
+    if entry is None:
+        return
+
+    face_indices = np.asarray(face_indices, dtype=np.int64)
+    group_ids = np.broadcast_to(np.asarray(group_ids, dtype=np.int32), face_indices.shape)
+
+    if not entry.can_update_in_place() or (len(face_indices) and face_indices.max() >= len(entry.face_groups)):
+        invalidate_overlay_cache(obj, poles=False)
+        return
+
+    entry.face_groups[face_indices] = group_ids
+    entry.color_lut = get_group_table(obj).color_lut.copy()
+
+    # only the index buffers of the touched chunks change, all other chunks stay on the GPU as they are
+    triangle_data = entry.triangle_data
+    face_tris = face_triangle_indices(triangle_data.face_tri_start, triangle_data.face_tri_end, face_indices)
+    face_tri_counts = triangle_data.face_tri_end[face_indices] - triangle_data.face_tri_start[face_indices]
+    triangle_data.tri_groups[face_tris] = np.repeat(effective_group_ids(entry.color_lut, group_ids), face_tri_counts)
+
+    entry.upload_chunks(triangle_data.face_chunks[face_indices])
+    invalidate_overlay_cache(obj, triangles=False, poles=False)
+
+
+def expect_own_mesh_update(obj):
+    # group and selection edits tag the mesh for a depsgraph update which must not throw the cached data away
+    for cache in (overlay_cache, mesh_data_cache):
+        entry = cache.get(obj.name_full)
+
+        if entry is not None:
+            entry.expects_own_update = True
+
+
+def release_overlay_entry(obj_name):
+    # the batches are freed with the entry, a later draw rebuilds them from scratch
+    entry = overlay_cache.pop(obj_name, None)
+
+    if entry is not None:
+        entry.cancel_pending_job()
+
+
+def release_untracked_entries(tracked_names):
+    for obj_name in [obj_name for obj_name in overlay_cache if obj_name not in tracked_names]:
+        release_overlay_entry(obj_name)
+
+
+def overlay_pool_bytes():
+    return sum(entry.gpu_bytes for entry in overlay_cache.values())
+
+
+def enforce_gpu_memory_budget(budget_bytes):
+    if budget_bytes <= 0:
+        return
+
+    pool_bytes = overlay_pool_bytes()
+    if pool_bytes <= budget_bytes:
+        return
+
+    # least recently on screen first - entries seen or built within the grace period and pending builds are kept,
+    # even if that leaves the pool over budget
+    now = time.monotonic()
+    eviction_order = sorted(
+        (entry.last_drawn, obj_name) for obj_name, entry in overlay_cache.items()
+        if entry.pending_job is None and now - max(entry.last_drawn, entry.last_built) > EVICTION_GRACE_SECONDS
+    )
+
+    for _, obj_name in eviction_order:
+        if pool_bytes <= budget_bytes:
+            break
+
+        pool_bytes -= overlay_cache[obj_name].gpu_bytes
+        release_overlay_entry(obj_name)
+        overlay_stats["evictions"] += 1
+
+
+def get_gpu_memory_budget():
+    addon = bpy.context.preferences.addons.get(__package__)
+    budget_mb = addon.preferences.gpu_memory_budget if addon is not None else DEFAULT_GPU_MEMORY_BUDGET_MB
+
+    return budget_mb * 1024 * 1024
+
+
+def get_gpu_pool_stats():
+    return {
+        "objects": len(overlay_cache),
+        "bytes": overlay_pool_bytes(),
+        "budget_bytes": get_gpu_memory_budget(),
+        "evictions": overlay_stats["evictions"],
+        "shaders": sum(shader is not None for shader in (overlay_shader, group_shader)),
+    }
+
+
+def clear_overlay_cache():
+    for entry in overlay_cache.values():
+        entry.cancel_pending_job()
+
+    overlay_cache.clear()
+    mesh_data_cache.clear()
+    group_tables.clear()
+
+
+# property update callbacks - `self` is either the object or one of its rv_groups, id_data is the owning object
+def tag_overlay_groups_update(self, context):
+    get_group_table(self.id_data).set_group_id(group_index(self), self.group_id)
+    invalidate_overlay_cache(self.id_data, poles=False)
+
+
+def tag_overlay_mesh_source_update(self, context):
+    invalidate_overlay_cache(self.id_data)
+
+
+def tag_overlay_group_color_update(self, context):
+    # group colors are shader uniforms, nothing has to be rebuilt
+    get_group_table(self.id_data).set_color(group_index(self), self.color)
+    tag_overlay_redraw()
+
+
+def tag_overlay_group_visibility_update(self, context):
+    # hidden groups are skipped at draw time, only their wireframe has to go
+    get_group_table(self.id_data).set_visible(group_index(self), self.visible)
+    invalidate_overlay_cache(self.id_data, triangles=False, poles=False)
+
+
+def tag_overlay_wireframe_update(self, context):
+    invalidate_overlay_cache(self.id_data, triangles=False, poles=False)
+
+
+def tag_overlay_poles_update(self, context):
+    invalidate_overlay_cache(self.id_data, triangles=False, wireframe=False, outline=False)
+
+
+def tag_overlay_outline_update(self, context):
+    invalidate_overlay_cache(self.id_data, triangles=False, wireframe=False, poles=False)
+
+
+def tag_overlay_fill_update(self, context):
+    tag_overlay_redraw()
+
+
+def tag_gpu_memory_budget_update(self, context):
+    # the budget is enforced after the next overlay draw
+    tag_overlay_redraw()
+
+
+def evaluated_geometry_signature(obj_eval):
+    # cheap stand-in for the modifier result, the add-on's own properties tag the object without changing it
+    mesh = obj_eval.data
+
+    return len(mesh.vertices), len(mesh.edges), len(mesh.polygons), tuple(tuple(corner) for corner in obj_eval.bound_box)
+
+
+def modifier_result_changed(entry, obj_eval):
+    return entry.geometry_signature is not None and evaluated_geometry_signature(obj_eval) != entry.geometry_signature
+
+
+@persistent
+def overlay_depsgraph_update_post(scene, depsgraph=None):
+    if not overlay_cache and not mesh_data_cache:
+        return
+
+    if depsgraph is None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+
+    # evaluated objects by name - object geometry updates also come from rv_* property edits
+    updated_objects = {}
+    updated_meshes = set()
+
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+
+        updated_id = update.id.original
+
+        if isinstance(updated_id, bpy.types.Object):
+            updated_objects[updated_id.name_full] = update.id
+        elif isinstance(updated_id, bpy.types.Mesh):
+            updated_meshes.add(updated_id.name_full)
+
+    redraw_needed = False
+
+    for cache in (overlay_cache, mesh_data_cache):
+        for obj_name, entry in cache.items():
+            # the mesh data caches only ever read the base mesh, modifier results matter to the overlay alone
+            mesh_changed = entry.mesh_name in updated_meshes or (
+                cache is overlay_cache
+                and obj_name in updated_objects
+                and modifier_result_changed(entry, updated_objects[obj_name])
+            )
+
+            if not mesh_changed:
+                continue
+
+            if entry.expects_own_update:
+                entry.expects_own_update = False
+                continue
+
+            entry.invalidate()
+            redraw_needed = redraw_needed or cache is overlay_cache
+
+    if redraw_needed:
+        tag_overlay_redraw()
+
+
+@persistent
+def overlay_cache_reset_post(*args):
+    # undo/redo and file loads swap out object data without reporting per-object updates
+    clear_overlay_cache()
+
+
+cache_handlers = (
+    (bpy.app.handlers.depsgraph_update_post, overlay_depsgraph_update_post),
+    (bpy.app.handlers.undo_post, overlay_cache_reset_post),
+    (bpy.app.handlers.redo_post, overlay_cache_reset_post),
+    (bpy.app.handlers.load_post, overlay_cache_reset_post),
+)
+
+
+def register_cache_handlers():
+    for handlers, handler in cache_handlers:
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister_cache_handlers():
+    global overlay_shader, group_shader
+
+    for handlers, handler in cache_handlers:
+        if handler in handlers:
+            handlers.remove(handler)
+
+    if bpy.app.timers.is_registered(update_requested_group_stats):
+        bpy.app.timers.unregister(update_requested_group_stats)
+    group_stats_requests.clear()
+
+    clear_overlay_cache()
+    overlay_shader = None
+    group_shader = None
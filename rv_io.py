@@ -0,0 +1,158 @@
+import struct
+import hashlib
+import zipfile
+import numpy as np
+
+from . rv_buffers import read_face_loop_totals, read_loop_vertices
+
+
+GROUP_FILE_VERSION = 1
+
+ENCODING_RUNS = "RUNS"
+ENCODING_RAW = "RAW"
+
+# run arrays above this size are memory-mapped straight out of the archive instead of being copied into memory
+MMAP_MIN_BYTES = 1 << 20
+
+ZIP_LOCAL_HEADER_SIZE = 30
+
+
+class GroupFile:
+    def __init__(self):
+        self.face_count = 0
+        self.topology_hash = ""
+
+        self.encoding = ENCODING_RUNS
+        self.run_values = None
+        self.run_lengths = None
+        self.raw_face_groups = None
+
+        self.group_ids = None
+        self.group_names = None
+        self.group_colors = None
+        self.group_visible = None
+        self.group_idx_counter = 1
+
+    def face_groups(self):
+        if self.encoding == ENCODING_RAW:
+            return np.asarray(self.raw_face_groups, dtype=np.int32)
+
+        return decode_runs(self.run_values, self.run_lengths)
+
+
+def encode_runs(values):
+    if len(values) == 0:
+        return values[:0], np.empty(0, dtype=np.int32)
+
+    run_starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    run_lengths = np.diff(np.append(run_starts, len(values)))
+
+    return values[run_starts], run_lengths.astype(np.int32)
+
+
+def narrowest_int_array(values):
+    # group ids and run lengths rarely need more than 8 or 16 bits
+    values = np.asarray(values)
+    if len(values) == 0:
+        return values.astype(np.uint8)
+
+    dtype = np.result_type(np.min_scalar_type(int(values.min())), np.min_scalar_type(int(values.max())))
+
+    return values.astype(dtype)
+
+
+def decode_runs(run_values, run_lengths):
+    return np.repeat(np.asarray(run_values, dtype=np.int32), run_lengths)
+
+
+def topology_hash(mesh):
+    # face sizes and their vertex order identify the topology, positions are free to change
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(read_face_loop_totals(mesh).tobytes())
+    digest.update(read_loop_vertices(mesh).tobytes())
+
+    return digest.hexdigest()
+
+
+def write_group_file(filepath, face_groups, groups, group_idx_counter, mesh_hash):
+    face_groups = np.asarray(face_groups, dtype=np.int32)
+    run_values, run_lengths = encode_runs(face_groups)
+
+    # a run costs a value and a length, fragmented assignments are smaller stored face by face
+    if 2 * len(run_values) > len(face_groups):
+        encoding = ENCODING_RAW
+        face_arrays = {"face_groups": narrowest_int_array(face_groups)}
+    else:
+        encoding = ENCODING_RUNS
+        face_arrays = {"run_values": narrowest_int_array(run_values), "run_lengths": narrowest_int_array(run_lengths)}
+
+    # stored without compression so import can map the arrays in place, runs and narrow dtypes keep them small anyway
+    with open(filepath, 'wb') as group_file:
+        np.savez(
+            group_file,
+            version=np.array(GROUP_FILE_VERSION),
+            face_count=np.array(len(face_groups)),
+            topology_hash=np.array(mesh_hash),
+            encoding=np.array(encoding),
+            **face_arrays,
+            group_ids=np.array([group.group_id for group in groups], dtype=np.int32),
+            group_names=np.array([group.name for group in groups], dtype=str),
+            group_colors=np.array([tuple(group.color) for group in groups], dtype=np.float32).reshape(-1, 3),
+            group_visible=np.array([group.visible for group in groups], dtype=bool),
+            group_idx_counter=np.array(group_idx_counter),
+        )
+
+
+def load_archive_array(filepath, archive, name):
+    info = archive.getinfo(name + ".npy")
+
+    if info.compress_type != zipfile.ZIP_STORED or info.file_size < MMAP_MIN_BYTES:
+        with archive.open(info) as member:
+            return np.lib.format.read_array(member, allow_pickle=False)
+
+    with open(filepath, 'rb') as raw_file:
+        raw_file.seek(info.header_offset)
+        local_header = raw_file.read(ZIP_LOCAL_HEADER_SIZE)
+        name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+
+        raw_file.seek(info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length)
+        major_version, _ = np.lib.format.read_magic(raw_file)
+
+        if major_version == 1:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(raw_file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(raw_file)
+
+        data_offset = raw_file.tell()
+
+    return np.memmap(filepath, dtype=dtype, mode='r', offset=data_offset, shape=shape, order='F' if fortran_order else 'C')
+
+
+def read_group_file(filepath):
+    group_file = GroupFile()
+
+    with zipfile.ZipFile(filepath) as archive:
+        version = int(load_archive_array(filepath, archive, "version"))
+        if version > GROUP_FILE_VERSION:
+            raise ValueError("Group file version {} is newer than supported version {}".format(version, GROUP_FILE_VERSION))
+
+        group_file.face_count = int(load_archive_array(filepath, archive, "face_count"))
+        group_file.topology_hash = str(load_archive_array(filepath, archive, "topology_hash"))
+
+        group_file.encoding = str(load_archive_array(filepath, archive, "encoding"))
+
+        if group_file.encoding == ENCODING_RAW:
+            group_file.raw_face_groups = load_archive_array(filepath, archive, "face_groups")
+        elif group_file.encoding == ENCODING_RUNS:
+            group_file.run_values = load_archive_array(filepath, archive, "run_values")
+            group_file.run_lengths = load_archive_array(filepath, archive, "run_lengths")
+        else:
+            raise ValueError("Unknown group file encoding {}".format(group_file.encoding))
+
+        group_file.group_ids = load_archive_array(filepath, archive, "group_ids").tolist()
+        group_file.group_names = load_archive_array(filepath, archive, "group_names").tolist()
+        group_file.group_colors = load_archive_array(filepath, archive, "group_colors").tolist()
+        group_file.group_visible = load_archive_array(filepath, archive, "group_visible").tolist()
+        group_file.group_idx_counter = int(load_archive_array(filepath, archive, "group_idx_counter"))
+
+    return group_file
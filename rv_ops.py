@@ -1,35 +1,151 @@
-import bpy
 import bmesh
 import numpy as np
-import bgl
-import blf
-import gpu
+import math
 import random
-import mathutils
 
-from bpy.props import StringProperty, FloatVectorProperty, BoolProperty, EnumProperty
+from bpy.props import StringProperty, FloatVectorProperty, BoolProperty, EnumProperty, IntProperty, FloatProperty
 from bpy.types import Operator
+from bpy_extras.io_utils import ExportHelper, ImportHelper
 from mathutils import Color
-from gpu_extras.batch import batch_for_shader
+from mathutils.bvhtree import BVHTree
+
+from . rv_cache import (
+    reassign_overlay_faces, expect_own_mesh_update, get_x_mirror_faces, get_face_adjacency,
+    get_group_table, invalidate_group_table, invalidate_group_stats, sync_edit_mesh, tag_overlay_redraw
+)
+from . rv_topology import (
+    with_mirrored_faces, flood_fill_faces, grow_region, shrink_region, read_edge_flags, read_face_normals,
+    label_face_islands, summarize_islands, build_face_samples, find_nearest_faces, vote_face_groups
+)
+from . rv_profiling import profiled_operator, dump_timings, clear_timings
+from . rv_io import write_group_file, read_group_file, topology_hash
+from . rv_buffers import (
+    GROUP_LAYER_NAME, read_face_group_ids, read_face_hidden, read_select_flags, write_face_group_ids, set_faces_selected,
+    read_vertex_coords, read_loop_vertices, read_face_loop_totals
+)
+
+
+def get_edit_mesh_group_layer(bm):
+    retopoViewGroupLayer = bm.faces.layers.int.get(GROUP_LAYER_NAME)
+    if retopoViewGroupLayer is None:
+        retopoViewGroupLayer = bm.faces.layers.int.new(GROUP_LAYER_NAME)
 
-from . rv_shaders import vertex_shader, fragment_shader
+    return retopoViewGroupLayer
 
 
 def set_up_marker_data_layer(self, context):
-    obj = context.object
+    ensure_group_layer(context.object)
 
-    object_mode = obj.mode
-    bpy.ops.object.mode_set(mode='OBJECT')
 
+def ensure_group_layer(obj):
     mesh = obj.data
 
-    retopoViewGroupLayer = mesh.polygon_layers_int.get("RetopoViewGroupLayer")
-    if retopoViewGroupLayer is None:
-        retopoViewGroupLayer = mesh.polygon_layers_int.new(name='RetopoViewGroupLayer')
+    # create the layer on whichever representation is live instead of switching modes
+    if obj.mode == 'EDIT':
+        get_edit_mesh_group_layer(bmesh.from_edit_mesh(mesh))
+    elif mesh.polygon_layers_int.get(GROUP_LAYER_NAME) is None:
+        mesh.polygon_layers_int.new(name=GROUP_LAYER_NAME)
+
+
+def get_active_face_index(obj):
+    if obj.mode == 'EDIT':
+        bm = bmesh.from_edit_mesh(obj.data)
+        bm.faces.index_update()
+
+        return bm.faces.active.index if bm.faces.active is not None else None
+
+    active_face = obj.data.polygons.active
+
+    return active_face if 0 <= active_face < len(obj.data.polygons) else None
+
+
+def with_x_mirror(operator, obj, face_indices):
+    if not obj.rv_use_x_mirror:
+        return np.asarray(face_indices, dtype=np.int64)
+
+    face_indices, unmatched_count = with_mirrored_faces(face_indices, get_x_mirror_faces(obj))
+
+    if unmatched_count:
+        operator.report({'WARNING'}, "{} faces have no X mirror partner".format(unmatched_count))
+
+    return face_indices
+
+
+def set_edit_mesh_faces_selected(mesh, faces, select):
+    # the faces are found with foreach_get on the synced mesh, only the matches are touched in the bmesh
+    bm = bmesh.from_edit_mesh(mesh)
+    bm.faces.ensure_lookup_table()
+
+    for face_idx in faces.tolist():
+        bm.faces[face_idx].select = select
+
+    bmesh.update_edit_mesh(mesh)
+
+
+def apply_face_groups(obj, face_groups, changed_faces, group_ids):
+    # face_groups is only written back in object mode, edit mode goes through the bmesh layer
+    mesh = obj.data
+    group_ids = np.broadcast_to(np.asarray(group_ids, dtype=np.int32), changed_faces.shape)
+
+    if obj.mode == 'EDIT':
+        bm = bmesh.from_edit_mesh(mesh)
+        retopoViewGroupLayer = get_edit_mesh_group_layer(bm)
+        bm.faces.ensure_lookup_table()
+
+        for face_idx, group_id in zip(changed_faces.tolist(), group_ids.tolist()):
+            bm.faces[face_idx][retopoViewGroupLayer] = group_id
+    else:
+        face_groups[changed_faces] = group_ids
+
+    reassign_overlay_faces(obj, changed_faces, group_ids)
+    invalidate_group_stats(obj)
+    expect_own_mesh_update(obj)
+
+    if obj.mode == 'EDIT':
+        bmesh.update_edit_mesh(mesh)
+    else:
+        write_face_group_ids(mesh, face_groups)
+
+    mesh.update()
+
+
+def get_random_group_color():
+    color = Color()
+    # set value and saturation to 1 - provides best overlay visibility
+    color.hsv = (random.random(), 1, 1)
+
+    return color
+
+
+def create_group(obj, name, color):
+    group = obj.rv_groups.add()
 
-    bpy.ops.object.mode_set(mode=object_mode)
+    group.color = color
+    group.group_id = obj.rv_group_idx_counter
+    group.name = name
+
+    obj.rv_group_idx_counter += 1
+
+    return group
+
+
+def replace_groups(obj, group_ids, names, colors, visible, group_idx_counter):
+    obj.rv_groups.clear()
+    invalidate_group_table(obj)
+
+    for group_id, name, color, group_visible in zip(group_ids, names, colors, visible):
+        group = obj.rv_groups.add()
 
+        group.color = color
+        group.group_id = group_id
+        group.name = name
+        group.visible = group_visible
 
+    obj.rv_group_idx_counter = max([group_idx_counter, obj.rv_group_idx_counter] + [group_id + 1 for group_id in group_ids])
+    obj.rv_index = 0
+
+
+@profiled_operator
 class RETOPOVIEW_OT_add_group(Operator):
     bl_idname = "retopoview.add_group"
     bl_label = "Add New Group"
@@ -38,39 +154,26 @@ class RETOPOVIEW_OT_add_group(Operator):
     group_name: StringProperty(name="Group Name", default="New Group")
     group_color: FloatVectorProperty(name="Group Color", subtype='COLOR', default=(1, 1, 1), min=0.0, max=1.0)
 
-    def get_random_color(self):
-        color = Color()
-        # set value and saturation to 1 - provides best overlay visibility
-        color.hsv = (random.random(), 1, 1)
-
-        return color
-
     def execute(self, context):
         obj = context.object
 
-        group = obj.rv_groups.add()
-
-        group.color = self.group_color
-        group.group_id = obj.rv_group_idx_counter
-        group.name = self.group_name
-
-        obj.rv_group_idx_counter += 1
+        create_group(obj, self.group_name, self.group_color)
 
         obj.rv_index = len(obj.rv_groups) - 1
 
         if len(obj.rv_groups) == 1:
-            obj.rv_enabled = True
             set_up_marker_data_layer(self, context)
             obj.data.update()
-            bpy.ops.retopoview.overlay('INVOKE_DEFAULT')
+            obj.rv_enabled = True
 
         return {'FINISHED'}
 
     def invoke(self, context, event):
-        self.group_color = self.get_random_color()
+        self.group_color = get_random_group_color()
         return context.window_manager.invoke_props_dialog(self)
 
 
+@profiled_operator
 class RETOPOVIEW_OT_handle_face_selection(Operator):
     bl_idname = "retopoview.handle_face_selection"
     bl_label = "Select/Deselect Faces"
@@ -81,50 +184,72 @@ class RETOPOVIEW_OT_handle_face_selection(Operator):
     def execute(self, context):
         obj = context.object
 
-        if obj.mode != 'EDIT' or len(obj.rv_groups) <= 0:
+        if len(obj.rv_groups) <= 0:
             return {'FINISHED'}
 
         group_id = obj.rv_groups[obj.rv_index].group_id
-
         mesh = obj.data
-        bm = bmesh.from_edit_mesh(mesh)
-        retopoViewGroupLayer = bm.faces.layers.int["RetopoViewGroupLayer"]
 
-        for face in bm.faces:
-            if face[retopoViewGroupLayer] == group_id:
-                face.select = not self.deselect
+        sync_edit_mesh(obj)
+        group_faces = np.flatnonzero(read_face_group_ids(mesh) == group_id)
 
-        bmesh.update_edit_mesh(mesh)
+        if obj.mode == 'EDIT':
+            set_edit_mesh_faces_selected(mesh, group_faces, not self.deselect)
+        else:
+            set_faces_selected(mesh, group_faces, not self.deselect)
+
+        # selection is not part of the overlay, keep the cached batches
+        expect_own_mesh_update(obj)
         mesh.update()
 
         return {'FINISHED'}
 
 
+@profiled_operator
 class RETOPOVIEW_OT_find_parent_group(Operator):
     bl_idname = "retopoview.find_parent_group"
     bl_label = "Find Parent Group"
-    bl_description = "Find parent group of selected faces, returns the first found group"
+    bl_description = "Find parent groups of selected faces, activates the group with the most selected faces"
+
+    def report_selection_groups(self, obj, group_ids, face_counts):
+        group_table = get_group_table(obj)
+        group_indices = group_table.id_to_index
+
+        found_groups = [
+            (face_count, group_indices[group_id])
+            for group_id, face_count in zip(group_ids, face_counts)
+            if group_id in group_indices
+        ]
+
+        if not found_groups:
+            self.report({'INFO'}, "No group found in selection")
+            return
+
+        found_groups.sort(key=lambda found_group: (-found_group[0], found_group[1]))
+        obj.rv_index = found_groups[0][1]
+
+        self.report({'INFO'}, ", ".join(
+            "{}: {} faces".format(group_table.names[group_idx], face_count) for face_count, group_idx in found_groups
+        ))
 
     def execute(self, context):
         obj = context.object
 
-        if obj.mode != 'EDIT' or len(obj.rv_groups) <= 0:
+        if len(obj.rv_groups) <= 0:
             return {'FINISHED'}
 
         mesh = obj.data
-        bm = bmesh.from_edit_mesh(mesh)
-        retopoViewGroupLayer = bm.faces.layers.int["RetopoViewGroupLayer"]
 
-        for face in bm.faces:
-            if face.select and face[retopoViewGroupLayer] != 0:
-                for idx, group in enumerate(obj.rv_groups):
-                    if group.group_id == face[retopoViewGroupLayer]:
-                        obj.rv_index = idx
-                        return {'FINISHED'}
+        sync_edit_mesh(obj)
+        selection_groups = read_face_group_ids(mesh)[read_select_flags(mesh.polygons)]
+
+        group_ids, face_counts = np.unique(selection_groups, return_counts=True)
+        self.report_selection_groups(obj, group_ids.tolist(), face_counts.tolist())
 
         return {'FINISHED'}
 
 
+@profiled_operator
 class RETOPOVIEW_OT_move_group(Operator):
     bl_idname = "retopoview.move_group"
     bl_label = "Move Group"
@@ -139,6 +264,7 @@ class RETOPOVIEW_OT_move_group(Operator):
 
     def move_group(self, offset, context, active_index, obj):
         obj.rv_groups.move(active_index, active_index + offset)
+        invalidate_group_table(obj)
         obj.rv_index += offset
 
     def execute(self, context):
@@ -159,6 +285,7 @@ class RETOPOVIEW_OT_move_group(Operator):
         return {'FINISHED'}
 
 
+@profiled_operator
 class RETOPOVIEW_OT_change_selection_group_id(Operator):
     bl_idname = "retopoview.change_selection_group_id"
     bl_label = "Assign Selection to Group"
@@ -177,35 +304,111 @@ class RETOPOVIEW_OT_change_selection_group_id(Operator):
         if self.remove:
             group_id = 0
 
-        object_mode = obj.mode
+        mesh = obj.data
 
-        if object_mode != "EDIT":
-            bpy.ops.object.mode_set(mode='EDIT')
+        sync_edit_mesh(obj)
+        face_groups = read_face_group_ids(mesh)
+        changed_faces = np.flatnonzero(read_select_flags(mesh.polygons))
+
+        changed_faces = with_x_mirror(self, obj, changed_faces)
+        apply_face_groups(obj, face_groups, changed_faces, group_id)
+
+        return {'FINISHED'}
+
+
+@profiled_operator
+class RETOPOVIEW_OT_flood_fill_group(Operator):
+    bl_idname = "retopoview.flood_fill_group"
+    bl_label = "Flood Fill Group"
+    bl_description = "Assign the region connected to the active face to the active group"
+
+    delimit_seams: BoolProperty(name="Stop at Seams", default=True)
+    delimit_sharp: BoolProperty(name="Stop at Sharp Edges", default=True)
+    max_angle: FloatProperty(name="Max Angle", subtype='ANGLE', default=math.pi, min=0.0, max=math.pi)
+
+    def execute(self, context):
+        obj = context.object
+
+        if len(obj.rv_groups) <= 0:
+            return {'FINISHED'}
 
+        group_id = obj.rv_groups[obj.rv_index].group_id
+        seed_face = get_active_face_index(obj)
+
+        if seed_face is None:
+            self.report({'WARNING'}, "No active face to fill from")
+            return {'CANCELLED'}
+
+        sync_edit_mesh(obj)
         mesh = obj.data
-        bm = bmesh.from_edit_mesh(mesh)
-        retopoViewGroupLayer = bm.faces.layers.int["RetopoViewGroupLayer"]
 
-        if obj.rv_use_x_mirror:
-            current_selection = set()
-            for face in bm.faces:
-                if face.select:
-                    current_selection.add(face)
+        face_groups = read_face_group_ids(mesh)
+        adjacency = get_face_adjacency(obj)
 
-            bpy.ops.mesh.select_mirror(axis={'X'}, extend=True)
+        # the fill stays within the seed face's current group, so existing group borders stop it
+        face_allowed = (face_groups == face_groups[seed_face]) & ~read_face_hidden(mesh)
 
-        for face in bm.faces:
-            if face.select:
-                face[retopoViewGroupLayer] = group_id
+        edge_passable = np.ones(len(mesh.edges), dtype=bool)
+        if self.delimit_seams:
+            edge_passable &= ~read_edge_flags(mesh, "use_seam")
+        if self.delimit_sharp:
+            edge_passable &= ~read_edge_flags(mesh, "use_edge_sharp")
 
-                if obj.rv_use_x_mirror and face not in current_selection:
-                    face.select = False
+        face_normals = None
+        min_cos_angle = None
+        if self.max_angle < math.pi:
+            face_normals = read_face_normals(mesh)
+            min_cos_angle = math.cos(self.max_angle)
 
-        bmesh.update_edit_mesh(mesh)
-        mesh.update()
+        filled_faces = flood_fill_faces(adjacency, seed_face, face_allowed, edge_passable, face_normals, min_cos_angle)
+
+        filled_faces = with_x_mirror(self, obj, filled_faces)
+        apply_face_groups(obj, face_groups, filled_faces, group_id)
+
+        self.report({'INFO'}, "Filled {} faces".format(len(filled_faces)))
+
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
+@profiled_operator
+class RETOPOVIEW_OT_grow_group(Operator):
+    bl_idname = "retopoview.grow_group"
+    bl_label = "Grow/Shrink Group"
+    bl_description = "Grow the active group into adjacent ungrouped faces or shrink it by rings of faces"
+
+    shrink: BoolProperty()
+    steps: IntProperty(name="Steps", default=1, min=1, max=100)
+
+    def execute(self, context):
+        obj = context.object
+
+        if len(obj.rv_groups) <= 0:
+            return {'FINISHED'}
+
+        group_id = obj.rv_groups[obj.rv_index].group_id
 
-        if object_mode != "EDIT":
-            bpy.ops.object.mode_set(mode=object_mode)
+        sync_edit_mesh(obj)
+        mesh = obj.data
+
+        face_groups = read_face_group_ids(mesh)
+        adjacency = get_face_adjacency(obj)
+        region = face_groups == group_id
+
+        if self.shrink:
+            changed_faces = np.flatnonzero(region & ~shrink_region(adjacency, region, self.steps))
+            group_id = 0
+        else:
+            # growing never takes faces away from another group
+            group_ids = get_group_table(obj).group_ids
+            face_allowed = ~np.isin(face_groups, group_ids) & ~read_face_hidden(mesh)
+
+            changed_faces = np.flatnonzero(grow_region(adjacency, region, face_allowed, self.steps) & ~region)
+
+        changed_faces = with_x_mirror(self, obj, changed_faces)
+        apply_face_groups(obj, face_groups, changed_faces, group_id)
 
         return {'FINISHED'}
 
@@ -217,16 +420,17 @@ class RETOPOVIEW_OT_toggle_mode(Operator):
 
     def invoke(self, context, event):
         obj = context.object
-        obj.rv_enabled = not obj.rv_enabled
 
-        if obj.rv_enabled:
+        if not obj.rv_enabled:
             set_up_marker_data_layer(self, context)
             obj.data.update()
-            bpy.ops.retopoview.overlay('INVOKE_DEFAULT')
+
+        obj.rv_enabled = not obj.rv_enabled
 
         return {'FINISHED'}
 
 
+@profiled_operator
 class RETOPOVIEW_OT_remove_group(Operator):
     bl_idname = "retopoview.remove_group"
     bl_label = "Remove Group"
@@ -238,25 +442,16 @@ class RETOPOVIEW_OT_remove_group(Operator):
         remove_id = obj.rv_index
         group_id = obj.rv_groups[remove_id].group_id
 
-        object_mode = obj.mode
-        bpy.ops.object.mode_set(mode='EDIT')
-
-        mesh = obj.data
-        bm = bmesh.from_edit_mesh(mesh)
-        retopoViewGroupLayer = bm.faces.layers.int["RetopoViewGroupLayer"]
-
-        for face in bm.faces:
-            if face[retopoViewGroupLayer] == group_id:
-                face[retopoViewGroupLayer] = 0
-
-        bmesh.update_edit_mesh(mesh)
-        mesh.update()
-
-        bpy.ops.object.mode_set(mode=object_mode)
+        sync_edit_mesh(obj)
+        face_groups = read_face_group_ids(obj.data)
+        changed_faces = np.flatnonzero(face_groups == group_id)
 
         obj.rv_groups.remove(remove_id)
+        invalidate_group_table(obj)
         obj.rv_index = obj.rv_index - 1 if obj.rv_index >= 1 else 0
 
+        apply_face_groups(obj, face_groups, changed_faces, 0)
+
         if len(obj.rv_groups) == 0:
             obj.rv_enabled = False
 
@@ -266,184 +461,300 @@ class RETOPOVIEW_OT_remove_group(Operator):
         return context.window_manager.invoke_confirm(self, event) if len(context.object.rv_groups) != 0 else {'FINISHED'}
 
 
-class RETOPOVIEW_OT_overlay(Operator):
-    bl_idname = "retopoview.overlay"
-    bl_label = "Retopoview face overlay operator"
-    bl_description = "Draw RetopoView face overlay"
+@profiled_operator
+class RETOPOVIEW_OT_group_islands(Operator):
+    bl_idname = "retopoview.group_islands"
+    bl_label = "Group Islands"
+    bl_description = "Report, split or clean up the disconnected islands of groups"
 
-    def get_smallest_vector_dimension(self, vector):
-        smallest_dimension = vector[0]
+    action: EnumProperty(
+        items=(
+            ('REPORT', "Report", "Report the island count of every group"),
+            ('SPLIT', "Split", "Move every island of the active group except the largest one into a new group"),
+            ('DELETE_SMALL', "Delete Small", "Unassign islands of the active group with fewer faces than the threshold")
+        )
+    )
+    min_faces: IntProperty(name="Min Faces", default=10, min=1)
 
-        for dimension in vector:
-            if dimension < smallest_dimension:
-                smallest_dimension = dimension
+    def report_islands(self, obj, island_groups):
+        group_ids, island_counts = np.unique(island_groups, return_counts=True)
+        group_island_counts = dict(zip(group_ids.tolist(), island_counts.tolist()))
+        group_table = get_group_table(obj)
 
-        return smallest_dimension
+        self.report({'INFO'}, ", ".join(
+            "{}: {} islands".format(name, group_island_counts.get(group_id, 0))
+            for group_id, name in zip(group_table.group_ids, group_table.names)
+        ))
 
-    def prep_wireframe_batch(self, shader, mesh, obj, vert_idx_cache, edge_indices):
-        coords = np.empty((len(mesh.vertices), 3), 'f')
-        mesh.vertices.foreach_get("co", np.reshape(coords, len(mesh.vertices) * 3))
+    def split_islands(self, obj, face_groups, island_labels, island_roots):
+        # the largest island keeps the group, rows are sorted by size already
+        split_roots = island_roots[1:]
 
-        # offset wireframe verts to have slightly different depth - works well only for close view range
-        for c_idx, coord in enumerate(coords):
-            coords[c_idx] = coord + mesh.vertices[c_idx].normal*0.0035
+        group = obj.rv_groups[obj.rv_index]
+        group_name = group.name
 
-        wireframe_colors = np.empty((len(mesh.vertices), 4), 'f')
-        for v_idx, _ in enumerate(mesh.vertices):
-            wireframe_colors[v_idx] = (0, 0, 0, obj.rv_groups_alpha) if v_idx in vert_idx_cache else (0, 0, 0, 0)
+        new_group_ids = np.array([
+            create_group(obj, "{}_{}".format(group_name, island_idx + 1), get_random_group_color()).group_id
+            for island_idx in range(len(split_roots))
+        ], dtype=np.int32)
 
-        return batch_for_shader(shader, 'LINES', {"position": coords, "color": wireframe_colors}, indices=edge_indices)
+        changed_faces = np.flatnonzero(np.isin(island_labels, split_roots))
 
-    def prep_pole_batch(self, shader, mesh, obj):
-        if obj.mode == 'EDIT':
-            bm = bmesh.from_edit_mesh(obj.data)
-        else:
-            bm = bmesh.new()
-            bm.from_mesh(obj.data)
+        root_order = np.argsort(split_roots)
+        island_rows = root_order[np.searchsorted(split_roots[root_order], island_labels[changed_faces])]
 
-        bm.verts.ensure_lookup_table()
-        bm.edges.ensure_lookup_table()
-        bm.faces.ensure_lookup_table()
+        apply_face_groups(obj, face_groups, changed_faces, new_group_ids[island_rows])
+        self.report({'INFO'}, "Split {} into {} groups".format(group_name, len(island_roots)))
 
-        pole_verts = [vert for vert in bm.verts if len(vert.link_edges) > 4]
-        pole_coords = []
-        pole_indices = []
+    def delete_small_islands(self, obj, face_groups, island_labels, island_roots, island_sizes):
+        small_roots = island_roots[island_sizes < self.min_faces]
+        changed_faces = np.flatnonzero(np.isin(island_labels, small_roots))
 
-        pole_idx = 0
-        for vert in pole_verts:
-            pole_coords.append(vert.co)
+        apply_face_groups(obj, face_groups, changed_faces, 0)
+        self.report({'INFO'}, "Removed {} islands with {} faces".format(len(small_roots), len(changed_faces)))
 
-            smallest_dimension = self.get_smallest_vector_dimension(obj.dimensions)
-            pole_coords.append(vert.co + vert.normal * smallest_dimension * 0.5 * obj.rv_poles_size)
-            pole_indices.append([pole_idx, pole_idx+1])
+    def execute(self, context):
+        obj = context.object
 
-            pole_idx += 2
+        if len(obj.rv_groups) <= 0:
+            return {'FINISHED'}
 
-        pole_color = (obj.rv_poles_color.r, obj.rv_poles_color.g, obj.rv_poles_color.b, 1)
-        pole_colors = [pole_color for _ in pole_coords]
+        sync_edit_mesh(obj)
+        face_groups = read_face_group_ids(obj.data)
 
-        return batch_for_shader(shader, 'LINES', {"position": pole_coords, "color": pole_colors}, indices=pole_indices)
+        # ids without a group in the list are not islands of anything
+        group_ids = get_group_table(obj).group_ids
+        island_labels = label_face_islands(
+            get_face_adjacency(obj), np.where(np.isin(face_groups, group_ids), face_groups, -1)
+        )
+        island_groups, island_roots, island_sizes = summarize_islands(island_labels, face_groups)
 
-    def draw_overlay(self, context, depsgraph, obj):
-        try:
-            if not obj or not obj.rv_enabled or len(obj.rv_groups) <= 0:
-                return {'FINISHED'}
-        except ReferenceError:
+        if self.action == 'REPORT':
+            self.report_islands(obj, island_groups)
             return {'FINISHED'}
 
-        obj = obj.evaluated_get(depsgraph)
-        mesh = obj.to_mesh()
+        active_islands = island_groups == obj.rv_groups[obj.rv_index].group_id
 
-        mesh.calc_loop_triangles()
-        shader = gpu.types.GPUShader(vertex_shader, fragment_shader)
+        if self.action == 'SPLIT':
+            if np.count_nonzero(active_islands) <= 1:
+                self.report({'INFO'}, "Group has a single island")
+                return {'FINISHED'}
 
-        verts = []
-        triangle_indices = []
-        colors = []
-        edge_indices = []
-        vert_idx_cache = set()
+            self.split_islands(obj, face_groups, island_labels, island_roots[active_islands])
+        else:
+            self.delete_small_islands(
+                obj, face_groups, island_labels, island_roots[active_islands], island_sizes[active_islands]
+            )
 
-        retopoViewGroupLayer = mesh.polygon_layers_int.get("RetopoViewGroupLayer")
+        return {'FINISHED'}
 
-        idx = 0
-        for _, triangle in enumerate(mesh.loop_triangles):
-            if mesh.polygons[triangle.polygon_index].hide and obj.mode == 'EDIT':
-                continue
+    def invoke(self, context, event):
+        if self.action == 'DELETE_SMALL':
+            return context.window_manager.invoke_props_dialog(self)
 
-            group_color = (1, 1, 1, 0)
-            triangle_parent_poly_group_id = retopoViewGroupLayer.data[triangle.polygon_index].value
+        return self.execute(context)
 
-            for group in obj.rv_groups:
-                if group.group_id == triangle_parent_poly_group_id:
-                    group_color = (group.color.r, group.color.g, group.color.b, 0.5)
 
-                    if obj.rv_show_wire:
-                        parent_poly = mesh.polygons[triangle.polygon_index]
-                        for edge_key in parent_poly.edge_keys:
-                            edge_indices.append(edge_key)
+@profiled_operator
+class RETOPOVIEW_OT_export_groups(Operator, ExportHelper):
+    bl_idname = "retopoview.export_groups"
+    bl_label = "Export Groups"
+    bl_description = "Save groups and face assignments to a file"
 
-                        for i in range(3):
-                            vert_idx_cache.add(triangle.vertices[i])
+    filename_ext = ".npz"
+    filter_glob: StringProperty(default="*.npz", options={'HIDDEN'})
 
-            for i in range(3):
-                verts.append(mesh.vertices[triangle.vertices[i]].co)
-                colors.append(group_color)
+    def execute(self, context):
+        obj = context.object
 
-            triangle_indices.append([idx, idx+1, idx+2])
-            idx = idx + 3
+        sync_edit_mesh(obj)
+        mesh = obj.data
 
-        shader = gpu.types.GPUShader(vertex_shader, fragment_shader)
-        batch = batch_for_shader(
-            shader, 'TRIS',
-            {"position": verts, "color": colors},
-            indices=triangle_indices,
+        write_group_file(
+            self.filepath, read_face_group_ids(mesh), obj.rv_groups, obj.rv_group_idx_counter, topology_hash(mesh)
         )
 
-        if obj.rv_show_wire:
-            wireframe_batch = self.prep_wireframe_batch(shader, mesh, obj, vert_idx_cache, edge_indices)
+        self.report({'INFO'}, "Exported {} groups".format(len(obj.rv_groups)))
+
+        return {'FINISHED'}
+
 
-        if obj.rv_show_poles:
-            pole_batch = self.prep_pole_batch(shader, mesh, obj)
+@profiled_operator
+class RETOPOVIEW_OT_import_groups(Operator, ImportHelper):
+    bl_idname = "retopoview.import_groups"
+    bl_label = "Import Groups"
+    bl_description = "Replace groups and face assignments with the ones saved in a file"
 
-        if obj.rv_backface_culling:
-            bgl.glEnable(bgl.GL_CULL_FACE)
+    filename_ext = ".npz"
+    filter_glob: StringProperty(default="*.npz", options={'HIDDEN'})
 
-        bgl.glEnable(bgl.GL_DEPTH_TEST)
-        bgl.glEnable(bgl.GL_BLEND)
+    ignore_topology: BoolProperty(
+        name="Ignore Topology Mismatch",
+        description="Apply the file to a mesh with the same face count even if its topology changed since the export"
+    )
 
-        for area in bpy.context.screen.areas:
-            if area.type == 'VIEW_3D':
-                for space in area.spaces:
-                    if space.type == 'VIEW_3D':
-                        if space.shading.type == 'WIREFRAME':
-                            bgl.glDepthFunc(bgl.GL_ALWAYS)
+    def execute(self, context):
+        obj = context.object
 
-        if obj.show_in_front:
-            bgl.glDepthFunc(bgl.GL_ALWAYS)
-            bgl.glEnable(bgl.GL_CULL_FACE)
+        sync_edit_mesh(obj)
+        mesh = obj.data
 
-        shader.bind()
-        shader.uniform_float("viewProjectionMatrix", bpy.context.region_data.perspective_matrix)
-        shader.uniform_float("worldMatrix", obj.matrix_world)
-        shader.uniform_float("alpha", obj.rv_groups_alpha)
-        batch.draw(shader)
+        try:
+            group_file = read_group_file(self.filepath)
+        except (OSError, KeyError, ValueError) as error:
+            self.report({'ERROR'}, "Could not read group file: {}".format(error))
+            return {'CANCELLED'}
+
+        if group_file.face_count != len(mesh.polygons):
+            self.report({'ERROR'}, "File has {} faces, mesh has {}".format(group_file.face_count, len(mesh.polygons)))
+            return {'CANCELLED'}
+
+        if not self.ignore_topology and group_file.topology_hash != topology_hash(mesh):
+            self.report({'ERROR'}, "Mesh topology does not match the exported mesh")
+            return {'CANCELLED'}
+
+        replace_groups(
+            obj, group_file.group_ids, group_file.group_names, group_file.group_colors,
+            group_file.group_visible, group_file.group_idx_counter
+        )
 
-        bgl.glDepthFunc(bgl.GL_LEQUAL)
-        shader.uniform_float("alpha", 1)
+        ensure_group_layer(obj)
 
-        if obj.rv_show_wire:
-            wireframe_batch.draw(shader)
+        face_groups = read_face_group_ids(mesh)
+        imported_groups = group_file.face_groups()
+        changed_faces = np.flatnonzero(face_groups != imported_groups)
 
-        if obj.rv_show_poles:
-            bgl.glLineWidth(2)
-            pole_batch.draw(shader)
+        apply_face_groups(obj, face_groups, changed_faces, imported_groups[changed_faces])
 
-        bgl.glLineWidth(1)
-        bgl.glDisable(bgl.GL_DEPTH_TEST)
-        bgl.glDisable(bgl.GL_BLEND)
+        if len(obj.rv_groups) > 0:
+            obj.rv_enabled = True
 
-        if obj.rv_backface_culling:
-            bgl.glDisable(bgl.GL_CULL_FACE)
+        self.report({'INFO'}, "Imported {} groups".format(len(obj.rv_groups)))
 
-    def modal(self, context, event):
-        context.area.tag_redraw()
+        return {'FINISHED'}
+
+
+@profiled_operator
+class RETOPOVIEW_OT_transfer_groups(Operator):
+    bl_idname = "retopoview.transfer_groups"
+    bl_label = "Transfer Groups"
+    bl_description = "Transfer group assignments from the other selected mesh onto the active one by nearest surface"
+
+    max_distance: FloatProperty(
+        name="Max Distance", description="Ignore source surface further away than this, 0 for no limit",
+        default=0.0, min=0.0, subtype='DISTANCE'
+    )
+    clear_ungrouped: BoolProperty(
+        name="Clear Ungrouped", description="Unassign target faces that lie over ungrouped source faces"
+    )
+
+    def read_source_groups(self, context, source):
+        depsgraph = context.evaluated_depsgraph_get()
+
+        # the tree and the group layer both come from the evaluated source, so their face indices agree
+        bvh = BVHTree.FromObject(source, depsgraph)
+
+        source_eval = source.evaluated_get(depsgraph)
+        source_mesh = source_eval.to_mesh()
 
         try:
-            if not self.invoked_obj.rv_enabled:
-                bpy.types.SpaceView3D.draw_handler_remove(self.overlay_handler, 'WINDOW')
-                return {'FINISHED'}
-        except ReferenceError:
-            bpy.types.SpaceView3D.draw_handler_remove(self.overlay_handler, 'WINDOW')
-            return {'FINISHED'}
+            source_groups = read_face_group_ids(source_mesh)
+        finally:
+            source_eval.to_mesh_clear()
+
+        # ids without a group on the source vote for "ungrouped"
+        source_groups[~np.isin(source_groups, get_group_table(source).group_ids)] = 0
+
+        return bvh, source_groups
+
+    def map_source_groups(self, obj, source, source_ids):
+        # groups are matched by name, missing ones are created with the source color
+        source_table = get_group_table(source)
+        target_table = get_group_table(obj)
+        target_ids_by_name = dict(zip(target_table.names, target_table.group_ids))
 
-        return {'PASS_THROUGH'}
+        id_map = np.zeros(max(source_ids, default=0) + 1, dtype=np.int32)
+
+        for source_id in source_ids:
+            source_idx = source_table.id_to_index[source_id]
+            name = source_table.names[source_idx]
+
+            if name not in target_ids_by_name:
+                target_ids_by_name[name] = create_group(obj, name, source_table.colors[source_idx]).group_id
+
+            id_map[source_id] = target_ids_by_name[name]
+
+        return id_map
+
+    def execute(self, context):
+        obj = context.object
+        sources = [other for other in context.selected_objects if other != obj and other.type == 'MESH']
+
+        if not sources:
+            self.report({'ERROR'}, "Select a source mesh, then the target mesh as active object")
+            return {'CANCELLED'}
+
+        source = sources[0]
+        bvh, source_groups = self.read_source_groups(context, source)
+
+        sync_edit_mesh(obj)
+        mesh = obj.data
+
+        samples, sample_faces = build_face_samples(
+            read_vertex_coords(mesh), read_loop_vertices(mesh), read_face_loop_totals(mesh)
+        )
+
+        # the tree lives in the source's local space
+        to_source = np.array(source.matrix_world.inverted() @ obj.matrix_world)
+        samples = samples @ to_source[:3, :3].T + to_source[:3, 3]
+
+        hit_faces = find_nearest_faces(bvh, samples, self.max_distance)
+        hit_faces[hit_faces >= len(source_groups)] = -1
+
+        sample_groups = np.where(hit_faces >= 0, source_groups[hit_faces], -1)
+        winners = vote_face_groups(sample_faces, sample_groups, len(mesh.polygons))
+
+        id_map = self.map_source_groups(obj, source, np.unique(winners[winners > 0]).tolist())
+
+        changed_faces = np.flatnonzero((winners > 0) | ((winners == 0) & self.clear_ungrouped))
+
+        ensure_group_layer(obj)
+        apply_face_groups(obj, read_face_group_ids(mesh), changed_faces, id_map[winners[changed_faces]])
+
+        if len(obj.rv_groups) > 0:
+            obj.rv_enabled = True
+
+        self.report({'INFO'}, "Transferred groups to {} faces from {}".format(len(changed_faces), source.name))
+
+        return {'FINISHED'}
 
     def invoke(self, context, event):
-        depsgraph = bpy.context.evaluated_depsgraph_get()
-        args = (context, depsgraph, context.object)
+        return context.window_manager.invoke_props_dialog(self)
+
+
+class RETOPOVIEW_OT_dump_timings(Operator, ExportHelper):
+    bl_idname = "retopoview.dump_timings"
+    bl_label = "Save Timings"
+    bl_description = "Save the recorded overlay and operator timings to a CSV or JSON file"
+
+    filename_ext = ".csv"
+    filter_glob: StringProperty(default="*.csv;*.json", options={'HIDDEN'})
+    check_extension = None
+
+    def execute(self, context):
+        sample_count = dump_timings(self.filepath)
+        self.report({'INFO'}, "Saved {} timing samples to {}".format(sample_count, self.filepath))
 
-        self.invoked_obj = context.object
-        self.overlay_handler = bpy.types.SpaceView3D.draw_handler_add(self.draw_overlay, args, 'WINDOW', 'POST_VIEW')
+        return {'FINISHED'}
+
+
+class RETOPOVIEW_OT_clear_timings(Operator):
+    bl_idname = "retopoview.clear_timings"
+    bl_label = "Clear Timings"
+    bl_description = "Forget all recorded overlay and operator timings"
 
-        context.window_manager.modal_handler_add(self)
-        return {'RUNNING_MODAL'}
\ No newline at end of file
+    def execute(self, context):
+        clear_timings()
+        tag_overlay_redraw()
+
+        return {'FINISHED'}
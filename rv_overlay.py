@@ -0,0 +1,583 @@
+import bpy
+import bgl
+import blf
+import time
+import numpy as np
+
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from bpy.app.handlers import persistent
+from gpu_extras.batch import batch_for_shader
+
+from . rv_cache import (
+    get_overlay_shader, get_group_shader, get_overlay_cache_entry, get_group_table, tag_overlay_redraw, overlay_cache,
+    gpu_array_bytes, release_overlay_entry, release_untracked_entries, enforce_gpu_memory_budget, get_gpu_memory_budget,
+    overlay_pool_bytes, evaluated_geometry_signature
+)
+from . rv_profiling import timed, count_cache_lookup, get_cache_lookups, get_stage_timing, count_redraw, redraws_per_second
+from . rv_buffers import (
+    read_vertex_coords, read_loop_triangles, read_face_group_ids, read_face_hidden, grouped_mask, build_chunked_triangle_buffers,
+    read_vertex_normals, read_edge_vertices, read_loop_edges, read_face_loop_totals, build_wireframe_buffers,
+    build_edge_lines, group_boundary_edges, effective_group_ids, compute_vertex_valence, boundary_vertex_mask, classify_poles, build_pole_glyphs,
+    visible_chunk_mask
+)
+
+
+# meshes below this face count are cheaper to build inline than to hand over to a worker
+ASYNC_BUILD_MIN_FACES = 200000
+CHUNK_TARGET_FACES = 20000
+OVERLAY_WORKERS = 2
+JOB_POLL_INTERVAL = 0.05
+
+HUD_FONT_SIZE = 11
+HUD_LINE_HEIGHT = 16
+HUD_MARGIN = 20
+
+overlay_draw_handler = None
+hud_draw_handler = None
+overlay_executor = None
+
+# names of objects with rv_enabled, None means the scene has to be scanned again
+tracked_objects = None
+# len(bpy.data.objects) at the last scan, added objects can come in with rv_enabled already set
+tracked_object_count = 0
+
+
+def get_smallest_vector_dimension(vector):
+    smallest_dimension = vector[0]
+
+    for dimension in vector:
+        if dimension < smallest_dimension:
+            smallest_dimension = dimension
+
+    return smallest_dimension
+
+
+class OverlaySnapshot:
+    def __init__(self, obj, parts, generation, previous_triangles):
+        self.parts = parts
+        self.generation = generation
+        self.object_name = obj.name
+        self.cancelled = False
+
+        # chunk layout of the batches on screen, reused while the topology stays the same
+        self.previous_triangles = previous_triangles
+
+        self.rv_groups_alpha = obj.rv_groups_alpha
+        self.wire_offset = obj.rv_wire_offset
+        self.outline_color = tuple(obj.rv_outline_color) + (1,)
+        self.glyph_length = get_smallest_vector_dimension(obj.dimensions) * 0.5 * obj.rv_poles_size
+        self.pole_classes = (
+            (obj.rv_show_n_poles, tuple(obj.rv_n_poles_color) + (1,)),
+            (obj.rv_show_e_poles, tuple(obj.rv_poles_color) + (1,)),
+            (obj.rv_show_high_valence_poles, tuple(obj.rv_high_valence_poles_color) + (1,)),
+        )
+
+        # face indices of the drawn mesh only match the base mesh while no modifier changes topology
+        self.maps_to_base = obj.rv_mesh_source == 'BASE' or not any(modifier.show_viewport for modifier in obj.modifiers)
+
+    def read_mesh(self, obj, mesh):
+        # every RNA read happens here on the main thread, workers only ever see these arrays
+        self.coords = read_vertex_coords(mesh)
+        self.face_groups = read_face_group_ids(mesh)
+        self.face_hidden = read_face_hidden(mesh) if obj.mode == 'EDIT' else None
+        # workers get their own copy, the table is updated in place by property callbacks
+        group_table = get_group_table(obj.original)
+        self.color_lut = group_table.color_lut.copy()
+        self.hidden_group_ids = np.array(sorted(group_table.hidden_ids), dtype=np.int32)
+
+        if 'TRIANGLES' in self.parts:
+            mesh.calc_loop_triangles()
+            self.tri_verts, self.tri_faces = read_loop_triangles(mesh)
+
+        if self.parts & {'WIREFRAME', 'OUTLINE', 'POLES'}:
+            self.normals = read_vertex_normals(mesh)
+            self.edge_verts = read_edge_vertices(mesh)
+            self.loop_edges = read_loop_edges(mesh)
+
+        if self.parts & {'WIREFRAME', 'OUTLINE'}:
+            self.face_loop_totals = read_face_loop_totals(mesh)
+
+    @property
+    def face_count(self):
+        return len(self.face_groups)
+
+
+class OverlayBuffers:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+        self.triangles = None
+        self.wireframe = None
+        self.outline = None
+        self.poles = None
+
+
+def prep_wireframe_buffers(snapshot):
+    wire_faces = grouped_mask(snapshot.color_lut, snapshot.face_groups)
+    if snapshot.face_hidden is not None:
+        wire_faces &= ~snapshot.face_hidden
+    if len(snapshot.hidden_group_ids):
+        wire_faces &= ~np.isin(snapshot.face_groups, snapshot.hidden_group_ids)
+
+    wire_coords, edge_indices = build_wireframe_buffers(
+        snapshot.coords, snapshot.normals, snapshot.edge_verts, snapshot.loop_edges,
+        snapshot.face_loop_totals, wire_faces, wire_depth_offset(snapshot)
+    )
+
+    wireframe_colors = np.empty((len(wire_coords), 4), dtype=np.float32)
+    wireframe_colors[:] = (0, 0, 0, snapshot.rv_groups_alpha)
+
+    return wire_coords, wireframe_colors, edge_indices
+
+
+def wire_depth_offset(snapshot):
+    # offset wireframe verts along their normals relative to the object size so the depth bias holds at any scale
+    object_size = float(np.ptp(snapshot.coords, axis=0).max()) if len(snapshot.coords) else 0.0
+
+    return object_size * snapshot.wire_offset
+
+
+def prep_outline_buffers(snapshot):
+    # hidden faces and hidden groups count as ungrouped, so the outline wraps what is actually drawn
+    outline_groups = effective_group_ids(snapshot.color_lut, snapshot.face_groups)
+    if snapshot.face_hidden is not None:
+        outline_groups[snapshot.face_hidden] = -1
+    if len(snapshot.hidden_group_ids):
+        outline_groups[np.isin(outline_groups, snapshot.hidden_group_ids)] = -1
+
+    outline_edges = group_boundary_edges(
+        snapshot.loop_edges, snapshot.face_loop_totals, outline_groups, len(snapshot.edge_verts)
+    )
+    outline_coords, outline_indices = build_edge_lines(
+        snapshot.coords, snapshot.normals, snapshot.edge_verts, outline_edges, wire_depth_offset(snapshot)
+    )
+
+    outline_colors = np.empty((len(outline_coords), 4), dtype=np.float32)
+    outline_colors[:] = snapshot.outline_color
+
+    return outline_coords, outline_colors, outline_indices
+
+
+def prep_pole_buffers(snapshot):
+    valence = compute_vertex_valence(snapshot.edge_verts, len(snapshot.coords))
+    boundary_verts = boundary_vertex_mask(snapshot.edge_verts, snapshot.loop_edges, len(snapshot.coords))
+    class_masks = classify_poles(valence, boundary_verts)
+
+    pole_verts = []
+    pole_colors = []
+
+    for (show_class, class_color), class_mask in zip(snapshot.pole_classes, class_masks):
+        if not show_class:
+            continue
+
+        class_verts = np.flatnonzero(class_mask)
+        pole_verts.append(class_verts)
+        pole_colors.append(np.tile(class_color, (len(class_verts), 1)))
+
+    pole_verts = np.concatenate(pole_verts) if pole_verts else np.empty(0, dtype=np.int64)
+    pole_colors = np.concatenate(pole_colors) if pole_colors else np.empty((0, 4), dtype=np.float32)
+
+    return build_pole_glyphs(snapshot.coords, snapshot.normals, pole_verts, pole_colors, snapshot.glyph_length)
+
+
+def prepare_overlay_buffers(snapshot):
+    # runs on a worker thread - pure NumPy, no bpy access
+    buffers = OverlayBuffers(snapshot)
+    obj_name = snapshot.object_name
+
+    with timed("build", obj_name):
+        if 'TRIANGLES' in snapshot.parts:
+            with timed("build.triangles", obj_name):
+                buffers.triangles = build_chunked_triangle_buffers(
+                    snapshot.coords, snapshot.tri_verts, snapshot.tri_faces, snapshot.face_groups, snapshot.color_lut,
+                    snapshot.face_hidden, CHUNK_TARGET_FACES, snapshot.previous_triangles
+                )
+
+        if snapshot.cancelled:
+            return None
+
+        if 'WIREFRAME' in snapshot.parts:
+            with timed("build.wireframe", obj_name):
+                buffers.wireframe = prep_wireframe_buffers(snapshot)
+
+        if snapshot.cancelled:
+            return None
+
+        if 'OUTLINE' in snapshot.parts:
+            with timed("build.outline", obj_name):
+                buffers.outline = prep_outline_buffers(snapshot)
+
+        if snapshot.cancelled:
+            return None
+
+        if 'POLES' in snapshot.parts:
+            with timed("build.poles", obj_name):
+                buffers.poles = prep_pole_buffers(snapshot)
+
+    return buffers
+
+
+def upload_overlay_buffers(shader, cache_entry, buffers):
+    with timed("upload", buffers.snapshot.object_name):
+        upload_overlay_batches(shader, cache_entry, buffers)
+
+
+def upload_overlay_batches(shader, cache_entry, buffers):
+    snapshot = buffers.snapshot
+    cache_entry.last_built = time.monotonic()
+
+    if buffers.triangles is not None:
+        cache_entry.set_triangle_data(buffers.triangles, snapshot.face_groups, snapshot.color_lut, snapshot.maps_to_base)
+
+    if buffers.wireframe is not None:
+        wire_coords, wireframe_colors, edge_indices = buffers.wireframe
+        cache_entry.wireframe_batch = batch_for_shader(
+            shader, 'LINES', {"position": wire_coords, "color": wireframe_colors}, indices=edge_indices
+        )
+        cache_entry.line_bytes['WIREFRAME'] = gpu_array_bytes(wire_coords, wireframe_colors, edge_indices)
+
+    if buffers.outline is not None:
+        outline_coords, outline_colors, outline_indices = buffers.outline
+        cache_entry.outline_batch = batch_for_shader(
+            shader, 'LINES', {"position": outline_coords, "color": outline_colors}, indices=outline_indices
+        )
+        cache_entry.line_bytes['OUTLINE'] = gpu_array_bytes(outline_coords, outline_colors, outline_indices)
+
+    if buffers.poles is not None:
+        pole_coords, pole_colors, pole_indices = buffers.poles
+        cache_entry.pole_batch = batch_for_shader(
+            shader, 'LINES', {"position": pole_coords, "color": pole_colors}, indices=pole_indices
+        )
+        cache_entry.line_bytes['POLES'] = gpu_array_bytes(pole_coords, pole_colors, pole_indices)
+
+    cache_entry.dirty_parts -= snapshot.parts
+
+
+@contextmanager
+def overlay_source_mesh(obj, depsgraph):
+    # base mesh comes from the original object - cage-like and never runs modifiers,
+    # the evaluated one is only needed when modifiers should be drawn
+    source_obj = obj if obj.rv_mesh_source == 'BASE' else obj.evaluated_get(depsgraph)
+    mesh = source_obj.to_mesh()
+
+    try:
+        yield source_obj, mesh
+    finally:
+        # temporary meshes are released as soon as the arrays are read
+        source_obj.to_mesh_clear()
+
+
+def get_overlay_executor():
+    global overlay_executor
+
+    if overlay_executor is None:
+        overlay_executor = ThreadPoolExecutor(max_workers=OVERLAY_WORKERS, thread_name_prefix="RetopoView")
+
+    return overlay_executor
+
+
+def collect_finished_job(shader, cache_entry):
+    job = cache_entry.pending_job
+
+    if job is None or not job.done():
+        return
+
+    cache_entry.pending_job = None
+    cache_entry.pending_snapshot = None
+
+    buffers = job.result()
+
+    # anything invalidated after the snapshot was taken bumps the generation, such results are stale
+    if buffers is not None and buffers.snapshot.generation == cache_entry.generation:
+        upload_overlay_buffers(shader, cache_entry, buffers)
+
+
+def update_overlay_batches(context, shader, cache_entry, obj):
+    collect_finished_job(shader, cache_entry)
+
+    if cache_entry.pending_job is not None:
+        return
+
+    parts = cache_entry.parts_to_build(obj)
+    count_cache_lookup(obj.name, hit=not parts)
+    if not parts:
+        return
+
+    snapshot = OverlaySnapshot(obj, parts, cache_entry.generation, cache_entry.triangle_data)
+
+    with timed("snapshot", obj.name), overlay_source_mesh(obj, context.evaluated_depsgraph_get()) as (source_obj, mesh):
+        snapshot.read_mesh(source_obj, mesh)
+
+    cache_entry.geometry_signature = evaluated_geometry_signature(source_obj) if source_obj is not obj else None
+
+    if snapshot.face_count < ASYNC_BUILD_MIN_FACES:
+        upload_overlay_buffers(shader, cache_entry, prepare_overlay_buffers(snapshot))
+        return
+
+    cache_entry.pending_snapshot = snapshot
+    cache_entry.pending_job = get_overlay_executor().submit(prepare_overlay_buffers, snapshot)
+
+    if not bpy.app.timers.is_registered(poll_overlay_jobs):
+        bpy.app.timers.register(poll_overlay_jobs, first_interval=JOB_POLL_INTERVAL)
+
+
+def poll_overlay_jobs():
+    pending_jobs = [entry.pending_job for entry in overlay_cache.values() if entry.pending_job is not None]
+
+    if any(job.done() for job in pending_jobs):
+        tag_overlay_redraw()
+
+    if all(job.done() for job in pending_jobs):
+        return None
+
+    return JOB_POLL_INTERVAL
+
+
+def draw_group_fill(context, group_shader, visible_chunks, obj):
+    group_shader.bind()
+    group_shader.uniform_float("viewProjectionMatrix", context.region_data.perspective_matrix)
+    group_shader.uniform_float("worldMatrix", obj.matrix_world)
+    group_shader.uniform_float("alpha", obj.rv_groups_alpha)
+
+    group_table = get_group_table(obj)
+
+    for chunk in visible_chunks:
+        for group_id, batch in chunk.group_batches.items():
+            if group_table.is_drawn(group_id):
+                group_shader.uniform_float("color", group_table.color_lut[group_id])
+                batch.draw(group_shader)
+
+
+def object_in_view(context, obj):
+    # the bound box already includes modifiers, objects outside the frustum are neither built nor uploaded
+    corners = np.ones((1, 8, 4), dtype=np.float32)
+    corners[0, :, :3] = np.array(obj.bound_box, dtype=np.float32)
+
+    return bool(visible_chunk_mask(corners, np.array(context.region_data.perspective_matrix @ obj.matrix_world))[0])
+
+
+def draw_object_overlay(context, shader, group_shader, cache_entry, obj, wireframe_shading):
+    if obj.rv_backface_culling:
+        bgl.glEnable(bgl.GL_CULL_FACE)
+
+    if wireframe_shading:
+        bgl.glDepthFunc(bgl.GL_ALWAYS)
+
+    if obj.show_in_front:
+        bgl.glDepthFunc(bgl.GL_ALWAYS)
+        bgl.glEnable(bgl.GL_CULL_FACE)
+
+    # chunks stay None until the first build for this object has finished
+    visible_chunks = None
+    if cache_entry.chunks is not None:
+        visible_chunks = cache_entry.visible_chunks(np.array(context.region_data.perspective_matrix @ obj.matrix_world))
+
+    if obj.rv_show_fill and visible_chunks is not None:
+        draw_group_fill(context, group_shader, visible_chunks, obj)
+
+    bgl.glDepthFunc(bgl.GL_LEQUAL)
+
+    shader.bind()
+    shader.uniform_float("viewProjectionMatrix", context.region_data.perspective_matrix)
+    shader.uniform_float("worldMatrix", obj.matrix_world)
+    shader.uniform_float("alpha", 1)
+
+    if obj.rv_show_wire and cache_entry.wireframe_batch is not None:
+        cache_entry.wireframe_batch.draw(shader)
+
+    bgl.glLineWidth(2)
+
+    if obj.rv_show_group_outline and cache_entry.outline_batch is not None:
+        cache_entry.outline_batch.draw(shader)
+
+    if obj.rv_show_poles and cache_entry.pole_batch is not None:
+        cache_entry.pole_batch.draw(shader)
+
+    bgl.glLineWidth(1)
+    bgl.glDisable(bgl.GL_CULL_FACE)
+
+    # the chunk bounds cover the whole mesh, without them the object counts as on screen
+    return visible_chunks is None or len(visible_chunks) > 0
+
+
+def refresh_tracked_objects():
+    global tracked_objects, tracked_object_count
+
+    enabled_objects = [obj for obj in bpy.data.objects if obj.type == 'MESH' and obj.rv_enabled]
+    tracked_objects = {obj.name for obj in enabled_objects}
+    tracked_object_count = len(bpy.data.objects)
+
+    # batches of deleted and disabled objects are freed right away
+    release_untracked_entries({obj.name_full for obj in enabled_objects})
+
+
+def draw_overlays():
+    context = bpy.context
+    count_redraw()
+
+    if tracked_objects is None or len(bpy.data.objects) != tracked_object_count:
+        refresh_tracked_objects()
+
+    if not tracked_objects:
+        return
+
+    shader = get_overlay_shader()
+    group_shader = get_group_shader()
+    wireframe_shading = context.space_data.shading.type == 'WIREFRAME'
+    needs_refresh = False
+    now = time.monotonic()
+
+    bgl.glEnable(bgl.GL_DEPTH_TEST)
+    bgl.glEnable(bgl.GL_BLEND)
+
+    for obj_name in tuple(tracked_objects):
+        obj = bpy.data.objects.get(obj_name)
+
+        # renamed or deleted objects are picked up again by the next scan
+        if obj is None or not obj.rv_enabled:
+            needs_refresh = True
+            continue
+
+        if len(obj.rv_groups) <= 0 or not obj.visible_get() or not object_in_view(context, obj):
+            continue
+
+        cache_entry = get_overlay_cache_entry(obj)
+        update_overlay_batches(context, shader, cache_entry, obj)
+
+        # CPU side only, the GPU runs the submitted draws asynchronously
+        with timed("draw", obj.name):
+            on_screen = draw_object_overlay(context, shader, group_shader, cache_entry, obj, wireframe_shading)
+
+        # objects culled by the frustum age like hidden ones, so the memory budget evicts them first
+        if on_screen:
+            cache_entry.last_drawn = now
+
+    bgl.glDepthFunc(bgl.GL_LEQUAL)
+    bgl.glDisable(bgl.GL_DEPTH_TEST)
+    bgl.glDisable(bgl.GL_BLEND)
+
+    if needs_refresh:
+        refresh_tracked_objects()
+
+    enforce_gpu_memory_budget(get_gpu_memory_budget())
+
+
+def format_stage_ms(obj_name, stage):
+    timing = get_stage_timing(obj_name, stage)
+
+    return "{:.2f} ms".format(timing.last * 1000) if timing is not None else "-"
+
+
+def hud_object_line(obj_name):
+    cache_entry = overlay_cache.get(obj_name)
+    triangle_data = cache_entry.triangle_data if cache_entry is not None else None
+    triangle_count = len(triangle_data.tri_verts) if triangle_data is not None else 0
+    cache_hits, cache_misses = get_cache_lookups(obj_name)
+
+    return "{}: {:,} tris | build {} | upload {} | draw {} | cache {} hit / {} miss".format(
+        obj_name, triangle_count, format_stage_ms(obj_name, "build"), format_stage_ms(obj_name, "upload"),
+        format_stage_ms(obj_name, "draw"), cache_hits, cache_misses
+    )
+
+
+def draw_profiling_hud():
+    context = bpy.context
+
+    if not context.window_manager.rv_show_profiling_hud or not tracked_objects:
+        return
+
+    hud_lines = ["RetopoView: {:.0f} redraws/s | GPU pool {:.1f} / {:.0f} MB".format(
+        redraws_per_second(), overlay_pool_bytes() / (1024 * 1024), get_gpu_memory_budget() / (1024 * 1024)
+    )]
+    hud_lines += [hud_object_line(obj_name) for obj_name in sorted(tracked_objects)]
+
+    ui_scale = context.preferences.view.ui_scale
+    line_height = HUD_LINE_HEIGHT * ui_scale
+    font_id = 0
+
+    blf.size(font_id, int(HUD_FONT_SIZE * ui_scale), 72)
+    blf.color(font_id, 1, 1, 1, 0.9)
+    blf.enable(font_id, blf.SHADOW)
+    blf.shadow(font_id, 3, 0, 0, 0, 0.8)
+
+    for line_idx, hud_line in enumerate(hud_lines):
+        blf.position(font_id, HUD_MARGIN, context.region.height - HUD_MARGIN * 3 - line_idx * line_height, 0)
+        blf.draw(font_id, hud_line)
+
+    blf.disable(font_id, blf.SHADOW)
+
+
+def tag_profiling_hud_update(self, context):
+    tag_overlay_redraw()
+
+
+def tag_overlay_enabled_update(self, context):
+    if tracked_objects is not None:
+        if self.rv_enabled:
+            tracked_objects.add(self.name)
+        else:
+            tracked_objects.discard(self.name)
+
+    if not self.rv_enabled:
+        release_overlay_entry(self.name_full)
+
+    tag_overlay_redraw()
+
+
+@persistent
+def overlay_tracking_reset_post(*args):
+    # undo/redo and file loads can bring back or drop enabled objects without touching rv_enabled
+    global tracked_objects
+
+    tracked_objects = None
+    tag_overlay_redraw()
+
+
+tracking_handlers = (
+    bpy.app.handlers.load_post,
+    bpy.app.handlers.undo_post,
+    bpy.app.handlers.redo_post,
+)
+
+
+def register_draw_manager():
+    global overlay_draw_handler, hud_draw_handler, tracked_objects
+
+    tracked_objects = None
+
+    if overlay_draw_handler is None:
+        overlay_draw_handler = bpy.types.SpaceView3D.draw_handler_add(draw_overlays, (), 'WINDOW', 'POST_VIEW')
+
+    # text has to be drawn in screen space, after the 3D overlay
+    if hud_draw_handler is None:
+        hud_draw_handler = bpy.types.SpaceView3D.draw_handler_add(draw_profiling_hud, (), 'WINDOW', 'POST_PIXEL')
+
+    for handlers in tracking_handlers:
+        if overlay_tracking_reset_post not in handlers:
+            handlers.append(overlay_tracking_reset_post)
+
+
+def unregister_draw_manager():
+    global overlay_draw_handler, hud_draw_handler, overlay_executor, tracked_objects
+
+    if bpy.app.timers.is_registered(poll_overlay_jobs):
+        bpy.app.timers.unregister(poll_overlay_jobs)
+
+    if overlay_executor is not None:
+        overlay_executor.shutdown(wait=False)
+        overlay_executor = None
+
+    for handlers in tracking_handlers:
+        if overlay_tracking_reset_post in handlers:
+            handlers.remove(overlay_tracking_reset_post)
+
+    if overlay_draw_handler is not None:
+        bpy.types.SpaceView3D.draw_handler_remove(overlay_draw_handler, 'WINDOW')
+        overlay_draw_handler = None
+
+    if hud_draw_handler is not None:
+        bpy.types.SpaceView3D.draw_handler_remove(hud_draw_handler, 'WINDOW')
+        hud_draw_handler = None
+
+    tracked_objects = None
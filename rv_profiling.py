@@ -0,0 +1,159 @@
+import csv
+import json
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+
+MAX_TIMING_SAMPLES = 20000
+REDRAW_RATE_WINDOW = 1.0
+
+# build stages report from the overlay worker threads as well
+timing_lock = threading.Lock()
+
+# (object name, stage) -> StageTiming, kept for the whole session
+stage_timings = {}
+# (wall clock time, object name, stage, seconds) of the most recent runs, for dumps
+timing_samples = deque(maxlen=MAX_TIMING_SAMPLES)
+# object name -> [hits, misses] of overlay batch lookups
+cache_lookups = {}
+redraw_times = deque()
+
+
+class StageTiming:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.peak = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.peak = max(self.peak, seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+def record_timing(stage, seconds, obj_name=""):
+    with timing_lock:
+        timing = stage_timings.get((obj_name, stage))
+        if timing is None:
+            timing = stage_timings[(obj_name, stage)] = StageTiming()
+
+        timing.add(seconds)
+        timing_samples.append((time.time(), obj_name, stage, seconds))
+
+
+@contextmanager
+def timed(stage, obj_name=""):
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record_timing(stage, time.perf_counter() - start, obj_name)
+
+
+def profiled_operator(cls):
+    # times execute of an operator class under "operator.<bl_idname>"
+    execute = cls.execute
+    stage = "operator." + cls.bl_idname
+
+    @wraps(execute)
+    def profiled_execute(self, context):
+        obj = context.object
+
+        with timed(stage, obj.name if obj is not None else ""):
+            return execute(self, context)
+
+    cls.execute = profiled_execute
+
+    return cls
+
+
+def get_stage_timing(obj_name, stage):
+    return stage_timings.get((obj_name, stage))
+
+
+def count_cache_lookup(obj_name, hit):
+    lookups = cache_lookups.get(obj_name)
+    if lookups is None:
+        lookups = cache_lookups[obj_name] = [0, 0]
+
+    lookups[0 if hit else 1] += 1
+
+
+def get_cache_lookups(obj_name):
+    return cache_lookups.get(obj_name, (0, 0))
+
+
+def count_redraw():
+    now = time.perf_counter()
+    redraw_times.append(now)
+
+    while redraw_times[0] < now - REDRAW_RATE_WINDOW:
+        redraw_times.popleft()
+
+
+def redraws_per_second():
+    if not redraw_times:
+        return 0.0
+
+    recent_redraws = sum(1 for redraw_time in redraw_times if redraw_time >= time.perf_counter() - REDRAW_RATE_WINDOW)
+
+    return recent_redraws / REDRAW_RATE_WINDOW
+
+
+def clear_timings():
+    with timing_lock:
+        stage_timings.clear()
+        timing_samples.clear()
+
+    cache_lookups.clear()
+    redraw_times.clear()
+
+
+def timing_summary():
+    with timing_lock:
+        return [
+            {
+                "object": obj_name, "stage": stage, "count": timing.count, "total_ms": timing.total * 1000,
+                "mean_ms": timing.mean * 1000, "last_ms": timing.last * 1000, "max_ms": timing.peak * 1000
+            }
+            for (obj_name, stage), timing in sorted(stage_timings.items())
+        ]
+
+
+def dump_timings(filepath):
+    # .json gets the per-stage summary, cache counters and raw samples, anything else one CSV row per sample
+    with timing_lock:
+        samples = list(timing_samples)
+
+    if filepath.lower().endswith(".json"):
+        report = {
+            "stages": timing_summary(),
+            "cache": {obj_name: {"hits": hits, "misses": misses} for obj_name, (hits, misses) in cache_lookups.items()},
+            "samples": [
+                {"time": sample_time, "object": obj_name, "stage": stage, "ms": seconds * 1000}
+                for sample_time, obj_name, stage, seconds in samples
+            ],
+        }
+
+        with open(filepath, 'w') as dump_file:
+            json.dump(report, dump_file, indent=2)
+    else:
+        with open(filepath, 'w', newline='') as dump_file:
+            writer = csv.writer(dump_file)
+            writer.writerow(("time", "object", "stage", "ms"))
+
+            for sample_time, obj_name, stage, seconds in samples:
+                writer.writerow(("{:.6f}".format(sample_time), obj_name, stage, "{:.4f}".format(seconds * 1000)))
+
+    return len(samples)
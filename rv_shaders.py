@@ -22,4 +22,27 @@ fragment_shader = '''
         if (fragColor.a == 0) discard;
         gl_FragColor = fragColor;
     }
-'''
\ No newline at end of file
+'''
+
+group_vertex_shader = '''
+    uniform mat4 viewProjectionMatrix;
+    uniform mat4 worldMatrix;
+
+    in vec3 position;
+
+    void main()
+    {
+        gl_Position = viewProjectionMatrix * worldMatrix * vec4(position, 1.0f);
+    }
+'''
+
+group_fragment_shader = '''
+    uniform vec4 color;
+    uniform float alpha;
+
+    void main()
+    {
+        if (color.a * alpha == 0) discard;
+        gl_FragColor = vec4(color.r, color.g, color.b, color.a * alpha);
+    }
+'''
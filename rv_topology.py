@@ -0,0 +1,312 @@
+import numpy as np
+
+from mathutils.kdtree import KDTree
+
+from . rv_buffers import classify_poles, expand_ranges
+
+
+def read_face_centers(mesh):
+    centers = np.empty(len(mesh.polygons) * 3, dtype=np.float64)
+    mesh.polygons.foreach_get("center", centers)
+
+    return centers.reshape(-1, 3)
+
+
+def build_x_mirror_face_map(centers, tolerance):
+    kd = KDTree(len(centers))
+    for face_idx, center in enumerate(centers.tolist()):
+        kd.insert(center, face_idx)
+    kd.balance()
+
+    mirrored_centers = centers * (-1.0, 1.0, 1.0)
+    mirror_faces = np.full(len(centers), -1, dtype=np.int64)
+
+    for face_idx, center in enumerate(mirrored_centers.tolist()):
+        _, match_idx, distance = kd.find(center)
+
+        if match_idx is not None and distance <= tolerance:
+            mirror_faces[face_idx] = match_idx
+
+    return mirror_faces
+
+
+def with_mirrored_faces(face_indices, mirror_faces):
+    face_indices = np.asarray(face_indices, dtype=np.int64)
+    partners = mirror_faces[face_indices]
+
+    unmatched_count = int(np.count_nonzero(partners < 0))
+    mirrored_faces = np.unique(np.concatenate((face_indices, partners[partners >= 0])))
+
+    return mirrored_faces, unmatched_count
+
+
+class FaceAdjacency:
+    def __init__(self, indptr, neighbor_faces, shared_edges):
+        # compressed sparse rows - the neighbors of face i are neighbor_faces[indptr[i]:indptr[i + 1]]
+        self.indptr = indptr
+        self.neighbor_faces = neighbor_faces
+        self.shared_edges = shared_edges
+
+    @property
+    def face_count(self):
+        return len(self.indptr) - 1
+
+    def neighbors(self, face_indices):
+        starts = self.indptr[face_indices]
+        counts = self.indptr[face_indices + 1] - starts
+        rows = expand_ranges(starts, counts)
+
+        return np.repeat(face_indices, counts), self.neighbor_faces[rows], self.shared_edges[rows]
+
+
+def build_face_adjacency(loop_edges, face_loop_totals, edge_count):
+    face_count = len(face_loop_totals)
+    loop_faces = np.repeat(np.arange(face_count), face_loop_totals)
+
+    loop_order = np.argsort(loop_edges, kind='stable')
+    sorted_edges = loop_edges[loop_order]
+    sorted_faces = loop_faces[loop_order]
+
+    edge_face_counts = np.bincount(loop_edges, minlength=edge_count)
+    max_edge_faces = int(edge_face_counts.max()) if len(edge_face_counts) else 0
+
+    # loops of one edge are consecutive once sorted, pairing every loop with the ones `offset` places
+    # further along links all faces around an edge - manifold meshes only need a single pass
+    pair_faces = []
+    pair_neighbors = []
+    pair_edges = []
+
+    for offset in range(1, max_edge_faces):
+        same_edge = sorted_edges[offset:] == sorted_edges[:-offset]
+
+        faces_a = sorted_faces[:-offset][same_edge]
+        faces_b = sorted_faces[offset:][same_edge]
+        edges = sorted_edges[offset:][same_edge]
+
+        pair_faces += [faces_a, faces_b]
+        pair_neighbors += [faces_b, faces_a]
+        pair_edges += [edges, edges]
+
+    if pair_faces:
+        pair_faces = np.concatenate(pair_faces)
+        pair_neighbors = np.concatenate(pair_neighbors)
+        pair_edges = np.concatenate(pair_edges)
+    else:
+        pair_faces = pair_neighbors = pair_edges = np.empty(0, dtype=np.int64)
+
+    distinct = pair_faces != pair_neighbors
+    pair_faces = pair_faces[distinct]
+
+    pair_order = np.argsort(pair_faces, kind='stable')
+
+    indptr = np.zeros(face_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pair_faces, minlength=face_count), out=indptr[1:])
+
+    return FaceAdjacency(indptr, pair_neighbors[distinct][pair_order], pair_edges[distinct][pair_order])
+
+
+def flood_fill_faces(adjacency, seed_face, face_allowed, edge_passable, face_normals=None, min_cos_angle=None):
+    region = np.zeros(adjacency.face_count, dtype=bool)
+    region[seed_face] = True
+    frontier = np.array([seed_face], dtype=np.int64)
+
+    # breadth first - each ring of the fill is a single batch of array operations
+    while len(frontier):
+        sources, neighbors, edges = adjacency.neighbors(frontier)
+
+        passable = ~region[neighbors] & face_allowed[neighbors] & edge_passable[edges]
+        if min_cos_angle is not None:
+            passable &= np.einsum('ij,ij->i', face_normals[sources], face_normals[neighbors]) >= min_cos_angle
+
+        frontier = np.unique(neighbors[passable])
+        region[frontier] = True
+
+    return np.flatnonzero(region)
+
+
+def grow_region(adjacency, region, face_allowed, steps):
+    region = region.copy()
+    frontier = np.flatnonzero(region)
+
+    for _ in range(steps):
+        _, neighbors, _ = adjacency.neighbors(frontier)
+
+        frontier = np.unique(neighbors[~region[neighbors] & face_allowed[neighbors]])
+        region[frontier] = True
+
+    return region
+
+
+def shrink_region(adjacency, region, steps):
+    region = region.copy()
+
+    for _ in range(steps):
+        sources, neighbors, _ = adjacency.neighbors(np.flatnonzero(region))
+
+        region[np.unique(sources[~region[neighbors]])] = False
+
+    return region
+
+
+def read_edge_flags(mesh, attribute):
+    flags = np.empty(len(mesh.edges), dtype=bool)
+    mesh.edges.foreach_get(attribute, flags)
+
+    return flags
+
+
+def read_face_normals(mesh):
+    normals = np.empty(len(mesh.polygons) * 3, dtype=np.float64)
+    mesh.polygons.foreach_get("normal", normals)
+
+    return normals.reshape(-1, 3)
+
+
+def label_face_islands(adjacency, face_groups):
+    # faces with a negative group id are left out and labelled -1
+    face_count = adjacency.face_count
+    sources = np.repeat(np.arange(face_count), np.diff(adjacency.indptr))
+    neighbors = adjacency.neighbor_faces
+
+    linked = (sources < neighbors) & (face_groups[sources] >= 0) & (face_groups[sources] == face_groups[neighbors])
+    faces_a = sources[linked]
+    faces_b = neighbors[linked]
+
+    parent = np.arange(face_count)
+
+    # union-find on whole arrays - hook the larger root of every linked pair onto the smaller one,
+    # then flatten the trees by pointer jumping until each face points straight at its root
+    while True:
+        roots_a = parent[faces_a]
+        roots_b = parent[faces_b]
+
+        unmerged = roots_a != roots_b
+        if not unmerged.any():
+            break
+
+        roots_a = roots_a[unmerged]
+        roots_b = roots_b[unmerged]
+        parent[np.maximum(roots_a, roots_b)] = np.minimum(roots_a, roots_b)
+
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+        faces_a = faces_a[unmerged]
+        faces_b = faces_b[unmerged]
+
+    return np.where(face_groups >= 0, parent, -1)
+
+
+def summarize_islands(island_labels, face_groups):
+    # one row per island: (group id, root face, face count), largest islands of a group first
+    grouped = island_labels >= 0
+    roots, face_counts = np.unique(island_labels[grouped], return_counts=True)
+    island_groups = face_groups[roots]
+
+    island_order = np.lexsort((-face_counts, island_groups))
+
+    return island_groups[island_order], roots[island_order], face_counts[island_order]
+
+
+def build_face_samples(coords, loop_verts, face_loop_totals):
+    face_count = len(face_loop_totals)
+    loop_faces = np.repeat(np.arange(face_count), face_loop_totals)
+    loop_coords = coords[loop_verts].astype(np.float64)
+
+    loop_starts = np.cumsum(face_loop_totals) - face_loop_totals
+    centers = np.add.reduceat(loop_coords, loop_starts, axis=0) / face_loop_totals[:, np.newaxis]
+
+    # the center plus a point halfway to every corner, so a face straddling a group border
+    # goes to whichever group covers most of it rather than to whatever lies under its center
+    samples = np.concatenate((centers, (centers[loop_faces] + loop_coords) * 0.5))
+    sample_faces = np.concatenate((np.arange(face_count), loop_faces))
+
+    return samples, sample_faces
+
+
+def find_nearest_faces(bvh, points, max_distance=0.0):
+    if max_distance > 0:
+        hits = (bvh.find_nearest(point, max_distance) for point in points.tolist())
+    else:
+        hits = map(bvh.find_nearest, points.tolist())
+
+    # samples without any surface in range come back as -1
+    return np.fromiter(
+        (face_idx if face_idx is not None else -1 for _, _, face_idx, _ in hits), dtype=np.int64, count=len(points)
+    )
+
+
+def vote_face_groups(sample_faces, sample_groups, face_count):
+    # majority vote per face, samples with a negative group abstain - faces without votes get -1
+    voting = sample_groups >= 0
+    sample_faces = sample_faces[voting]
+    sample_groups = sample_groups[voting].astype(np.int64)
+
+    winners = np.full(face_count, -1, dtype=np.int64)
+    if len(sample_faces) == 0:
+        return winners
+
+    group_span = int(sample_groups.max()) + 1
+    vote_keys, vote_counts = np.unique(sample_faces * group_span + sample_groups, return_counts=True)
+    vote_faces, vote_groups = np.divmod(vote_keys, group_span)
+
+    # ties go to the lower group id, np.unique already sorted them that way
+    vote_order = np.lexsort((-vote_counts, vote_faces))
+    vote_faces = vote_faces[vote_order]
+    first_votes = np.concatenate(([True], vote_faces[1:] != vote_faces[:-1]))
+
+    winners[vote_faces[first_votes]] = vote_groups[vote_order][first_votes]
+
+    return winners
+
+
+class GroupStats:
+    def __init__(self, face_counts, areas, tris, quads, ngons, poles):
+        # all arrays are indexed by group id
+        self.face_counts = face_counts
+        self.areas = areas
+        self.tris = tris
+        self.quads = quads
+        self.ngons = ngons
+        self.poles = poles
+
+    def group_row(self, group_id):
+        if not 0 <= group_id < len(self.face_counts):
+            return 0, 0.0, 0, 0, 0, 0
+
+        return (
+            int(self.face_counts[group_id]), float(self.areas[group_id]), int(self.tris[group_id]),
+            int(self.quads[group_id]), int(self.ngons[group_id]), int(self.poles[group_id])
+        )
+
+
+def compute_group_stats(face_groups, face_loop_totals, face_areas, loop_verts, valence, boundary_verts):
+    face_groups = np.maximum(face_groups, 0)
+    group_span = int(face_groups.max()) + 1 if len(face_groups) else 1
+
+    face_counts = np.bincount(face_groups, minlength=group_span)
+    areas = np.bincount(face_groups, weights=face_areas, minlength=group_span)
+    tris = np.bincount(face_groups[face_loop_totals == 3], minlength=group_span)
+    quads = np.bincount(face_groups[face_loop_totals == 4], minlength=group_span)
+    ngons = face_counts - tris - quads
+
+    # a pole lies inside a group when every face around it belongs to that group,
+    # which is the case exactly when the variance of the group ids around the vertex is zero
+    loop_groups = np.repeat(face_groups, face_loop_totals).astype(np.float64)
+    vertex_count = len(valence)
+
+    vert_loops = np.bincount(loop_verts, minlength=vertex_count)
+    group_sums = np.bincount(loop_verts, weights=loop_groups, minlength=vertex_count)
+    group_squares = np.bincount(loop_verts, weights=loop_groups * loop_groups, minlength=vertex_count)
+
+    single_group = (vert_loops > 0) & (vert_loops * group_squares == group_sums * group_sums)
+    vert_groups = np.rint(group_sums / np.maximum(vert_loops, 1)).astype(np.int64)
+
+    n_poles, e_poles, high_valence_poles = classify_poles(valence, boundary_verts)
+    inner_poles = single_group & ~boundary_verts & (n_poles | e_poles | high_valence_poles)
+    poles = np.bincount(vert_groups[inner_poles], minlength=group_span)
+
+    return GroupStats(face_counts, areas, tris, quads, ngons, poles)
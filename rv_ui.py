@@ -1,6 +1,8 @@
 import bpy
 from bpy.types import UIList, Panel, Menu
 
+from . rv_cache import overlay_stats, get_group_stats, get_group_table
+
 
 class RETOPOVIEW_MT_rv_pie_menu(Menu):
     bl_label = "RetopoView"
@@ -37,6 +39,7 @@ class RETOPOVIEW_UL_group_list(UIList):
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
         layout.prop(item, "color", text="", emboss=True, icon='COLOR')
         layout.prop(item, "name", text="", emboss=False)
+        layout.prop(item, "visible", text="", emboss=False, icon='HIDE_OFF' if item.visible else 'HIDE_ON')
 
 
 class RETOPOVIEW_PT_rv_tool_menu(Panel):
@@ -79,6 +82,12 @@ class RETOPOVIEW_PT_rv_tool_menu(Panel):
         list_controls.operator("retopoview.move_group", text='', icon='TRIA_UP').direction = 'UP'
         list_controls.operator("retopoview.move_group", text='', icon='TRIA_DOWN').direction = 'DOWN'
 
+        list_controls.separator()
+
+        list_controls.operator("retopoview.export_groups", text='', icon='EXPORT')
+        list_controls.operator("retopoview.import_groups", text='', icon='IMPORT')
+        list_controls.operator("retopoview.transfer_groups", text='', icon='MOD_DATA_TRANSFER')
+
         layout.separator(factor=0.1)
 
         if len(obj.rv_groups) <= 0:
@@ -96,7 +105,7 @@ class RETOPOVIEW_PT_rv_tool_menu(Panel):
         group_subrow.label(text=obj.rv_groups[obj.rv_index].name)
 
         box = layout.box()
-        box.enabled = obj.mode == 'EDIT' and obj.rv_enabled
+        box.enabled = obj.rv_enabled
         edit_column = box.column()
 
         edit_column.separator(factor=0.5)
@@ -116,23 +125,107 @@ class RETOPOVIEW_PT_rv_tool_menu(Panel):
         parent_finder_row = edit_column.row(align=True)
         parent_finder_row.operator("retopoview.find_parent_group", text='Find Parent Group')
 
+        edit_column.separator(factor=0.1)
+
+        fill_row = edit_column.row(align=True)
+        fill_row.operator("retopoview.flood_fill_group", text='Flood Fill')
+        fill_row.operator("retopoview.grow_group", text='Grow').shrink = False
+        fill_row.operator("retopoview.grow_group", text='Shrink').shrink = True
+
+        edit_column.separator(factor=0.1)
+
+        islands_row = edit_column.row(align=True)
+        islands_row.operator("retopoview.group_islands", text='Islands').action = 'REPORT'
+        islands_row.operator("retopoview.group_islands", text='Split').action = 'SPLIT'
+        islands_row.operator("retopoview.group_islands", text='Clean Up').action = 'DELETE_SMALL'
+
         edit_column.separator(factor=0.5)
 
         layout.separator(factor=0.1)
 
         quick_access_column = layout.column()
         quick_access_column.prop(obj, 'rv_groups_alpha', text='Overlay Opacity', slider=True)
+        quick_access_column.prop(obj, 'rv_mesh_source', text='Draw On')
         quick_access_column.separator(factor=0.2)
         quick_access_column.prop(obj, 'rv_backface_culling', text='Backface Culling')
+        quick_access_column.prop(obj, "rv_show_fill", text="Show Fill")
         quick_access_column.prop(obj, "rv_show_wire", text="Show Wireframe")
+        outline_row = quick_access_column.row(align=True)
+        outline_row.prop(obj, "rv_show_group_outline", text="Show Group Outline")
+        if obj.rv_show_group_outline:
+            outline_row.prop(obj, "rv_outline_color", text="")
+        if obj.rv_show_wire or obj.rv_show_group_outline:
+            quick_access_column.prop(obj, 'rv_wire_offset', text='Wireframe Offset', slider=True)
         quick_access_column.prop(obj, 'show_in_front', text='Object In Front')
         quick_access_column.prop(obj, 'rv_use_x_mirror', text='X Mirror')
+        if obj.rv_use_x_mirror:
+            quick_access_column.prop(obj, 'rv_x_mirror_tolerance', text='Mirror Tolerance')
         quick_access_column.prop(obj, 'rv_show_poles', text='Show Poles')
 
         poles_settings_column = layout.column()
 
         if obj.rv_show_poles:
-            color_row = poles_settings_column.row()
-            color_row.prop(obj, 'rv_poles_color', text='Poles Color', icon='COLOR', emboss=True)
+            pole_classes = (
+                ('rv_show_n_poles', 'rv_n_poles_color', 'N-Poles (3)'),
+                ('rv_show_e_poles', 'rv_poles_color', 'E-Poles (5)'),
+                ('rv_show_high_valence_poles', 'rv_high_valence_poles_color', 'High Valence (6+)'),
+            )
+
+            for show_prop, color_prop, class_label in pole_classes:
+                class_row = poles_settings_column.row()
+                class_row.prop(obj, show_prop, text=class_label)
+                class_row.prop(obj, color_prop, text='', icon='COLOR', emboss=True)
+
             poles_settings_column.separator(factor=0.1)
             poles_settings_column.prop(obj, 'rv_poles_size', text='Poles Size', slider=True)
+
+        layout.separator(factor=0.1)
+        layout.label(text='Overlay redraws triggered: {}'.format(overlay_stats["redraws"]), icon='INFO')
+
+        profiling_row = layout.row(align=True)
+        profiling_row.prop(context.window_manager, 'rv_show_profiling_hud', text='Profiling HUD', toggle=True)
+        profiling_row.operator("retopoview.dump_timings", text='', icon='FILE_TICK')
+        profiling_row.operator("retopoview.clear_timings", text='', icon='TRASH')
+
+
+class RETOPOVIEW_PT_group_stats(Panel):
+    bl_label = "Group Statistics"
+    bl_idname = "RETOPOVIEW_PT_group_stats"
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = 'data'
+    bl_parent_id = "RETOPOVIEW_PT_rv_tool_menu"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.object
+        return obj is not None and obj.type == 'MESH' and len(obj.rv_groups) > 0
+
+    def draw(self, context):
+        layout = self.layout
+        obj = context.object
+
+        group_stats = get_group_stats(obj)
+
+        if group_stats is None:
+            layout.label(text='Updating statistics...', icon='TIME')
+            return
+
+        stats_grid = layout.grid_flow(row_major=True, columns=7, even_columns=False, align=True)
+
+        for header in ('Group', 'Faces', 'Area', 'Tris', 'Quads', 'Ngons', 'Poles'):
+            stats_grid.label(text=header)
+
+        group_table = get_group_table(obj)
+
+        for group_id, name in zip(group_table.group_ids, group_table.names):
+            face_count, area, tris, quads, ngons, poles = group_stats.group_row(group_id)
+
+            stats_grid.label(text=name)
+            stats_grid.label(text=str(face_count))
+            stats_grid.label(text='{:.4g}'.format(area))
+            stats_grid.label(text=str(tris))
+            stats_grid.label(text=str(quads))
+            stats_grid.label(text=str(ngons))
+            stats_grid.label(text=str(poles))
@@ -0,0 +1,236 @@
+# RetopoView
+# Copyright (C) 2021  Loki Bear
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Checks the NumPy triangle buffers against the original per-triangle loop, then checks the speedup:
+#
+#   blender --background --factory-startup --python tests/triangle_buffers_parity.py
+#   blender --background --factory-startup --python tests/triangle_buffers_parity.py -- --speed-faces 500000 --min-speedup 50
+#
+# Blender exits with code 1 when the buffers differ or the NumPy path is not fast enough.
+
+import argparse
+import os
+import sys
+import time
+
+import bpy
+import numpy as np
+
+# blender --python leaves the script folder off sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+from addon_loader import import_addon
+
+
+UNKNOWN_GROUP_ID = 99
+HIDDEN_FACE_RATIO = 0.1
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    parser = argparse.ArgumentParser(prog="triangle_buffers_parity.py")
+    parser.add_argument("--speed-faces", type=int, default=500000, help="quads of the speed check mesh, two triangles each")
+    parser.add_argument("--min-speedup", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=0)
+
+    return parser.parse_args(argv)
+
+
+def legacy_triangle_buffers(obj, mesh, skip_hidden):
+    # the per-triangle loop the overlay used before the NumPy path, kept as the reference
+    verts = []
+    triangle_indices = []
+    colors = []
+
+    retopoViewGroupLayer = mesh.polygon_layers_int.get("RetopoViewGroupLayer")
+
+    idx = 0
+    for _, triangle in enumerate(mesh.loop_triangles):
+        if mesh.polygons[triangle.polygon_index].hide and skip_hidden:
+            continue
+
+        group_color = (1, 1, 1, 0)
+        triangle_parent_poly_group_id = retopoViewGroupLayer.data[triangle.polygon_index].value
+
+        for group in obj.rv_groups:
+            if group.group_id == triangle_parent_poly_group_id:
+                group_color = (group.color.r, group.color.g, group.color.b, 0.5)
+
+        for i in range(3):
+            verts.append(mesh.vertices[triangle.vertices[i]].co)
+            colors.append(group_color)
+
+        triangle_indices.append([idx, idx+1, idx+2])
+        idx = idx + 3
+
+    return verts, colors, triangle_indices
+
+
+def legacy_drawn_triangles(obj, mesh, skip_hidden):
+    verts, colors, triangle_indices = legacy_triangle_buffers(obj, mesh, skip_hidden)
+
+    positions = np.array(verts, dtype=np.float32).reshape(-1, 3)
+    colors = np.array(colors, dtype=np.float32).reshape(-1, 4)
+    triangle_indices = np.array(triangle_indices, dtype=np.int64).reshape(-1, 3)
+
+    rows = np.hstack((positions[triangle_indices].reshape(-1, 9), colors[triangle_indices[:, 0]]))
+
+    # fully transparent triangles never show up on screen, the NumPy path does not upload them at all
+    return rows[rows[:, -1] > 0]
+
+
+def numpy_triangle_buffers(modules, obj, mesh, skip_hidden):
+    rv_buffers = modules['rv_buffers']
+
+    coords = rv_buffers.read_vertex_coords(mesh)
+    tri_verts, tri_faces = rv_buffers.read_loop_triangles(mesh)
+    face_groups = rv_buffers.read_face_group_ids(mesh)
+    face_hidden = rv_buffers.read_face_hidden(mesh) if skip_hidden else None
+    color_lut = modules['rv_cache'].get_group_table(obj).color_lut
+
+    return rv_buffers.build_chunked_triangle_buffers(coords, tri_verts, tri_faces, face_groups, color_lut, face_hidden), color_lut
+
+
+def numpy_drawn_triangles(modules, obj, mesh, skip_hidden):
+    triangle_data, color_lut = numpy_triangle_buffers(modules, obj, mesh, skip_hidden)
+
+    rows = [np.empty((0, 13), dtype=np.float32)]
+
+    for positions, group_tris in triangle_data.chunk_buffers.values():
+        for group_id, tris in group_tris.items():
+            group_colors = np.broadcast_to(color_lut[group_id], (len(tris), 4))
+            rows.append(np.hstack((positions[tris].reshape(-1, 9), group_colors)))
+
+    return np.concatenate(rows)
+
+
+def sorted_rows(rows):
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def add_primitive(add_operator, **kwargs):
+    add_operator(**kwargs)
+    obj = bpy.context.object
+
+    # loop triangles of a freshly added primitive stay valid once it leaves edit mode
+    obj.data.calc_loop_triangles()
+
+    return obj
+
+
+def assign_random_groups(modules, obj, rng):
+    api = modules['api']
+    mesh = obj.data
+
+    group_ids = api.create_groups(obj, ["Group A", "Group B", "Group C"])
+    face_count = len(mesh.polygons)
+
+    # ungrouped faces and faces pointing at an id without a group must both stay transparent
+    api.set_face_groups(obj, rng.choice(group_ids + [0, UNKNOWN_GROUP_ID], face_count))
+
+    face_hidden = rng.random(face_count) < HIDDEN_FACE_RATIO
+    mesh.polygons.foreach_set("hide", face_hidden)
+    mesh.update()
+
+
+def check_parity(modules, rng):
+    primitives = (
+        ("uv sphere (tris and quads)", bpy.ops.mesh.primitive_uv_sphere_add, {"segments": 24, "ring_count": 12}),
+        ("grid (quads)", bpy.ops.mesh.primitive_grid_add, {"x_subdivisions": 30, "y_subdivisions": 30}),
+        ("cone (tris and an ngon)", bpy.ops.mesh.primitive_cone_add, {"vertices": 32, "end_fill_type": 'NGON'}),
+        ("circle (one ngon)", bpy.ops.mesh.primitive_circle_add, {"vertices": 48, "fill_type": 'NGON'}),
+        ("monkey (tris and quads)", bpy.ops.mesh.primitive_monkey_add, {}),
+    )
+
+    failures = []
+
+    for label, add_operator, kwargs in primitives:
+        obj = add_primitive(add_operator, **kwargs)
+        assign_random_groups(modules, obj, rng)
+
+        for skip_hidden in (False, True):
+            legacy_rows = sorted_rows(legacy_drawn_triangles(obj, obj.data, skip_hidden))
+            numpy_rows = sorted_rows(numpy_drawn_triangles(modules, obj, obj.data, skip_hidden))
+
+            matches = legacy_rows.shape == numpy_rows.shape and np.array_equal(legacy_rows, numpy_rows)
+            case = "{}{}".format(label, ", hidden faces skipped" if skip_hidden else "")
+            print("{:<50} {:>6} triangles  {}".format(case, len(legacy_rows), "ok" if matches else "MISMATCH"))
+
+            if not matches:
+                failures.append(case)
+
+    return failures
+
+
+def create_grid_object(face_count):
+    side = max(1, int(round(face_count ** 0.5)))
+    bpy.ops.mesh.primitive_grid_add(x_subdivisions=side, y_subdivisions=side)
+
+    obj = bpy.context.object
+    obj.data.calc_loop_triangles()
+
+    return obj
+
+
+def check_speed(modules, rng, args):
+    obj = create_grid_object(args.speed_faces)
+    assign_random_groups(modules, obj, rng)
+    mesh = obj.data
+
+    start = time.perf_counter()
+    numpy_triangle_buffers(modules, obj, mesh, skip_hidden=False)
+    numpy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy_triangle_buffers(obj, mesh, skip_hidden=False)
+    legacy_seconds = time.perf_counter() - start
+
+    speedup = legacy_seconds / max(numpy_seconds, 1e-9)
+    print("{} triangles: legacy {:.2f}s, NumPy {:.3f}s, {:.0f}x faster".format(
+        len(mesh.loop_triangles), legacy_seconds, numpy_seconds, speedup
+    ))
+
+    if speedup < args.min_speedup:
+        return ["speedup {:.0f}x is below {:.0f}x".format(speedup, args.min_speedup)]
+
+    return []
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    addon, modules = import_addon(('api', 'rv_cache', 'rv_buffers'))
+    addon.register()
+
+    try:
+        failures = check_parity(modules, rng)
+        failures += check_speed(modules, rng, args)
+    finally:
+        addon.unregister()
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print("    " + failure)
+        sys.exit(1)
+
+    print("\nAll triangle buffer checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# RetopoView
+# Copyright (C) 2021  Loki Bear
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Loads the add-on from this checkout for the headless scripts in benchmarks/, tests/ and tools/.
+# blender --python does not put the script folder on sys.path, so scripts add tools/ before importing this.
+
+import importlib
+import os
+import sys
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_addon(module_names):
+    # the add-on is a package named after its folder, import it the way blender would
+    if os.path.dirname(REPO_DIR) not in sys.path:
+        sys.path.insert(0, os.path.dirname(REPO_DIR))
+
+    package_name = os.path.basename(REPO_DIR)
+
+    addon = importlib.import_module(package_name)
+    modules = {name: importlib.import_module(package_name + "." + name) for name in module_names}
+
+    return addon, modules
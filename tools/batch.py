@@ -0,0 +1,363 @@
+# RetopoView
+# Copyright (C) 2021  Loki Bear
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+# Runs one RetopoView job over many .blend files, spread across parallel background blender processes:
+#
+#   blender -b --factory-startup --python tools/batch.py -- stats assets/ --workers 8 --report report.json
+#   blender -b --factory-startup --python tools/batch.py -- validate --file-list files.txt
+#   blender -b --factory-startup --python tools/batch.py -- export assets/ --output-dir markup/
+#   blender -b --factory-startup --python tools/batch.py -- strip assets/ --dry-run
+#
+# Jobs:
+#   stats     face count of every group
+#   validate  check the group layer against rv_groups, exits with 1 when a file has issues
+#   export    write the groups of every object to <output dir>/<file name>/<object name>.npz
+#   strip     remove groups and the group layer and save the file
+#
+# The process started by the user only hands out the files, each worker process opens a batch of files
+# in turn and reads the group layer with bulk array reads. The merged report is written as JSON.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from multiprocessing.pool import ThreadPool
+
+import bpy
+import numpy as np
+
+# blender --python leaves the script folder off sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from addon_loader import import_addon
+
+
+SCRIPT_PATH = os.path.abspath(__file__)
+
+JOBS = ('stats', 'validate', 'export', 'strip')
+STDERR_TAIL_LINES = 20
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    parser = argparse.ArgumentParser(prog="batch.py", description="Run a RetopoView job over many .blend files")
+    parser.add_argument("job", choices=JOBS)
+    parser.add_argument("paths", nargs='*', help=".blend files or directories searched recursively")
+    parser.add_argument("--file-list", help="text file with one .blend path per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel blender processes")
+    parser.add_argument("--files-per-process", type=int, default=8, help="files opened by one blender process")
+    parser.add_argument("--report", help="write the merged JSON report here instead of printing it")
+    parser.add_argument("--output-dir", help="export job: directory for the group files")
+    parser.add_argument("--dry-run", action='store_true', help="strip job: report what would go without saving")
+    parser.add_argument("--blender", default=bpy.app.binary_path, help="blender executable for the workers")
+    parser.add_argument("--worker-result", help=argparse.SUPPRESS)
+
+    args = parser.parse_args(argv)
+
+    if args.job == 'export' and not args.output_dir and not args.worker_result:
+        parser.error("the export job needs --output-dir")
+
+    return args
+
+
+def collect_blend_files(args):
+    paths = list(args.paths)
+
+    if args.file_list:
+        with open(args.file_list) as file_list:
+            paths += [line.strip() for line in file_list if line.strip()]
+
+    blend_files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, _, file_names in os.walk(path):
+                blend_files += [os.path.join(dir_path, name) for name in sorted(file_names) if name.endswith(".blend")]
+        else:
+            blend_files.append(path)
+
+    # the same file twice would be opened and saved by two workers at once
+    return list(dict.fromkeys(os.path.abspath(path) for path in blend_files))
+
+
+# worker side - runs inside the background blender processes
+
+
+def group_layer(mesh, modules):
+    return mesh.polygon_layers_int.get(modules['rv_buffers'].GROUP_LAYER_NAME)
+
+
+def marked_objects(modules):
+    return [
+        obj for obj in bpy.data.objects
+        if obj.type == 'MESH' and (len(obj.rv_groups) > 0 or group_layer(obj.data, modules) is not None)
+    ]
+
+
+def object_stats(obj, modules, args, filepath):
+    face_groups = modules['rv_buffers'].read_face_group_ids(obj.data)
+    group_ids = [group.group_id for group in obj.rv_groups]
+
+    layer_ids, layer_counts = np.unique(face_groups, return_counts=True)
+    face_counts = dict(zip(layer_ids.tolist(), layer_counts.tolist()))
+
+    return {
+        "object": obj.name,
+        "faces": len(face_groups),
+        "ungrouped_faces": int(np.count_nonzero(~np.isin(face_groups, group_ids))),
+        "groups": [
+            {"id": group.group_id, "name": group.name, "faces": face_counts.get(group.group_id, 0)}
+            for group in obj.rv_groups
+        ],
+    }
+
+
+def object_issues(obj, modules, args, filepath):
+    has_layer = group_layer(obj.data, modules) is not None
+    face_groups = modules['rv_buffers'].read_face_group_ids(obj.data)
+    group_ids = [group.group_id for group in obj.rv_groups]
+
+    issues = []
+
+    if group_ids and not has_layer:
+        issues.append("has groups but no group layer")
+
+    if not group_ids and np.any(face_groups != 0):
+        issues.append("group layer assigns faces but there are no groups")
+
+    unknown_ids, unknown_counts = np.unique(face_groups[~np.isin(face_groups, group_ids + [0])], return_counts=True)
+    if len(unknown_ids):
+        issues.append("{} faces use unknown group ids {}".format(int(unknown_counts.sum()), unknown_ids.tolist()))
+
+    duplicate_ids = sorted({group_id for group_id in group_ids if group_ids.count(group_id) > 1})
+    if duplicate_ids:
+        issues.append("duplicate group ids {}".format(duplicate_ids))
+
+    if any(group_id <= 0 for group_id in group_ids):
+        issues.append("group ids must be positive")
+
+    if group_ids and obj.rv_group_idx_counter <= max(group_ids):
+        issues.append("group id counter {} is not above the largest id {}".format(obj.rv_group_idx_counter, max(group_ids)))
+
+    return {"object": obj.name, "valid": not issues, "issues": issues}
+
+
+def export_object(obj, modules, args, filepath):
+    rv_io = modules['rv_io']
+    mesh = obj.data
+
+    export_dir = os.path.join(args.output_dir, os.path.splitext(os.path.basename(filepath))[0])
+    export_path = os.path.join(export_dir, bpy.path.clean_name(obj.name) + ".npz")
+    os.makedirs(export_dir, exist_ok=True)
+
+    rv_io.write_group_file(
+        export_path, modules['rv_buffers'].read_face_group_ids(mesh), obj.rv_groups,
+        obj.rv_group_idx_counter, rv_io.topology_hash(mesh)
+    )
+
+    return {"object": obj.name, "groups": len(obj.rv_groups), "path": export_path}
+
+
+def strip_object(obj, modules, args, filepath):
+    record = {"object": obj.name, "groups": len(obj.rv_groups)}
+
+    if obj.library is not None or obj.data.library is not None:
+        record["skipped"] = "linked from a library"
+        return record
+
+    if args.dry_run:
+        return record
+
+    obj.rv_groups.clear()
+    obj.rv_group_idx_counter = 1
+    obj.rv_index = 0
+    obj.rv_enabled = False
+
+    mesh = obj.data
+    if group_layer(mesh, modules) is not None:
+        # the generic attribute API drops the layer in place, without copying the mesh through bmesh
+        mesh.attributes.remove(mesh.attributes[modules['rv_buffers'].GROUP_LAYER_NAME])
+
+    return record
+
+
+JOB_FUNCTIONS = {
+    'stats': object_stats,
+    'validate': object_issues,
+    'export': export_object,
+    'strip': strip_object,
+}
+
+
+def process_file(filepath, modules, args):
+    start = time.perf_counter()
+    record = {"file": filepath}
+
+    try:
+        bpy.ops.wm.open_mainfile(filepath=filepath, load_ui=False)
+
+        job_function = JOB_FUNCTIONS[args.job]
+        record["objects"] = [job_function(obj, modules, args, filepath) for obj in marked_objects(modules)]
+
+        if args.job == 'strip' and not args.dry_run and record["objects"]:
+            bpy.ops.wm.save_mainfile()
+
+        record["status"] = 'ok'
+    except Exception as error:
+        record["status"] = 'error'
+        record["error"] = "{}: {}".format(type(error).__name__, error)
+
+    record["seconds"] = time.perf_counter() - start
+
+    return record
+
+
+def run_worker(args):
+    addon, modules = import_addon(('rv_buffers', 'rv_io'))
+    addon.register()
+
+    records = [process_file(filepath, modules, args) for filepath in args.paths]
+
+    with open(args.worker_result, 'w') as result_file:
+        json.dump(records, result_file)
+
+
+# controller side - hands out batches of files and merges what the workers report
+
+
+def worker_command(args, file_batch, result_path):
+    command = [
+        args.blender, "--background", "--factory-startup", "-noaudio", "--python", SCRIPT_PATH,
+        "--", args.job, *file_batch, "--worker-result", result_path
+    ]
+
+    if args.output_dir:
+        command += ["--output-dir", os.path.abspath(args.output_dir)]
+    if args.dry_run:
+        command.append("--dry-run")
+
+    return command
+
+
+def run_file_batch(task):
+    args, file_batch, result_path = task
+
+    completed = subprocess.run(
+        worker_command(args, file_batch, result_path), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+
+    records = []
+    if os.path.exists(result_path):
+        with open(result_path) as result_file:
+            records = json.load(result_file)
+
+    # a crashed worker leaves the rest of its batch without a record
+    reported_files = {record["file"] for record in records}
+    crash_error = "blender exited with code {}: {}".format(
+        completed.returncode, "\n".join(completed.stderr.splitlines()[-STDERR_TAIL_LINES:])
+    )
+
+    records += [
+        {"file": filepath, "status": 'error', "error": crash_error}
+        for filepath in file_batch if filepath not in reported_files
+    ]
+
+    return records
+
+
+def summarize(job, records):
+    summary = {
+        "files": len(records),
+        "failed_files": sum(record["status"] != 'ok' for record in records),
+        "objects": sum(len(record.get("objects", ())) for record in records),
+    }
+
+    if job == 'stats':
+        summary["groups"] = sum(len(obj["groups"]) for record in records for obj in record.get("objects", ()))
+        summary["faces"] = sum(obj["faces"] for record in records for obj in record.get("objects", ()))
+
+    if job == 'validate':
+        summary["invalid_files"] = sum(
+            any(not obj["valid"] for obj in record.get("objects", ())) for record in records
+        )
+
+    return summary
+
+
+def run_controller(args):
+    blend_files = collect_blend_files(args)
+    if not blend_files:
+        print("No .blend files found")
+        return 0
+
+    files_per_process = max(1, args.files_per_process)
+    file_batches = [blend_files[start:start + files_per_process] for start in range(0, len(blend_files), files_per_process)]
+    worker_count = max(1, min(args.workers, len(file_batches)))
+
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix="retopoview_batch_") as result_dir:
+        tasks = [
+            (args, file_batch, os.path.join(result_dir, "batch_{}.json".format(batch_idx)))
+            for batch_idx, file_batch in enumerate(file_batches)
+        ]
+
+        # the pool threads only wait on blender processes, the work itself runs in parallel in those
+        records = []
+        with ThreadPool(worker_count) as pool:
+            for batch_records in pool.imap_unordered(run_file_batch, tasks):
+                records += batch_records
+                print("{}/{} files done".format(len(records), len(blend_files)), file=sys.stderr)
+
+    file_order = {filepath: file_idx for file_idx, filepath in enumerate(blend_files)}
+    records.sort(key=lambda record: file_order[record["file"]])
+
+    summary = summarize(args.job, records)
+    report = {
+        "job": args.job,
+        "workers": worker_count,
+        "elapsed_seconds": time.perf_counter() - start,
+        "summary": summary,
+        "files": records,
+    }
+
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        print(json.dumps(summary, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+    return 1 if summary["failed_files"] or summary.get("invalid_files") else 0
+
+
+def main():
+    args = parse_args()
+
+    if args.worker_result:
+        run_worker(args)
+    else:
+        sys.exit(run_controller(args))
+
+
+if __name__ == "__main__":
+    main()